@@ -6,7 +6,16 @@ Admin panel configuration for Streak and StreakSettings models.
 
 from django.contrib import admin
 import nested_admin
-from .models import Streak, ChallengeSettings, UserFeatureReach, Choice, Question, Quiz, QuizAttempt
+from .models import (
+    Streak,
+    ChallengeSettings,
+    UserFeatureReach,
+    Choice,
+    Question,
+    Quiz,
+    QuizAttempt,
+    FeatureReachHistory,
+)
 
 #pylint: disable=E1101
 
@@ -39,6 +48,16 @@ class ChallengeSettingsAdmin(admin.ModelAdmin):
     )
 
 
+class FeatureReachHistoryAdmin(admin.ModelAdmin):
+    """
+    Admin panel configuration for the archived reach history.
+    """
+
+    list_display = ("day", "user", "feature_instance", "extra", "count")
+    list_filter = ("day", "extra")
+    date_hierarchy = "day"
+
+
 class ChoiceInline(nested_admin.NestedTabularInline):
     """
     This is the admin panel configuration for the Choice model
@@ -65,6 +84,7 @@ class QuizAdmin(nested_admin.NestedModelAdmin):
 
 
 admin.site.register(UserFeatureReach)
+admin.site.register(FeatureReachHistory, FeatureReachHistoryAdmin)
 admin.site.register(Streak, StreakAdmin)
 admin.site.register(ChallengeSettings, ChallengeSettingsAdmin)
 admin.site.register(QuizAttempt)
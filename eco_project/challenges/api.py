@@ -10,6 +10,8 @@ from locations.models import QuestionFeature
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from users.location_updates import get_profile_location
+from users.points import award_points
 from .challenge_helpers import (
     get_current_window,
     streak_to_points,
@@ -62,9 +64,7 @@ def collect_streak(request) -> Response:
         streak.raw_count = 1
 
     # add points to the user
-    points_awarded = streak_to_points(streak.raw_count)
-    user.profile.points += points_awarded
-    user.profile.save()
+    award_points(user, streak_to_points(streak.raw_count), "streak")
 
     # Update the last_window to the start of the current window.
     streak.last_window = current_window_start
@@ -128,8 +128,7 @@ def submit_answer_api(request) -> Response:
         # get how many point per question feature from challenge settings
 
         points_per_q = ChallengeSettings.get_solo().question_feature_points
-        request.user.profile.points += points_per_q
-        request.user.profile.save()
+        award_points(request.user, points_per_q, "question")
 
     # Return response with required info
     return Response(
@@ -154,8 +153,7 @@ def nearest_challenges_api(request) -> JsonResponse:
 
     # Find all the challenges that the user has not yet reached
     # and are within a certain distance of the user
-    current_user_lat = request.user.profile.latitude
-    current_user_long = request.user.profile.longitude
+    current_user_lat, current_user_long = get_profile_location(request.user.profile)
     challenges = get_features_near(current_user_lat, current_user_long, request.user)
     return JsonResponse({"challenges": challenges})
 
@@ -219,8 +217,7 @@ def score_quiz(request: HttpRequest) -> Response:
             defaults={'answers': answers, 'score': percentage}
         )
         if created:
-            request.user.profile.points += points
-            request.user.profile.save()
+            award_points(request.user, points, "quiz")
 
             if percentage > 80:
                 reward_health = 20
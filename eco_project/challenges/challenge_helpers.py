@@ -6,11 +6,15 @@ This module is stores helper functions to deal with challenges.
 from datetime import timedelta
 from math import log2
 
+import numpy as np
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from locations.chunk_handling import haversine
+from locations.feature_snapshot import get_feature_snapshot
 from locations.models import FeatureInstance
+from users.location_updates import get_profile_location
 
 User = get_user_model()
 
@@ -23,12 +27,7 @@ def get_interval() -> timedelta:
     """
     # pylint: disable=import-outside-toplevel
     from .models import ChallengeSettings
-    try:
-        settings_obj = ChallengeSettings.objects.first()
-        interval = settings_obj.interval if settings_obj else timedelta(days=1)
-    except ChallengeSettings.DoesNotExist:
-        interval = timedelta(days=1)
-    return interval
+    return ChallengeSettings.get_solo().interval
 
 
 def get_current_window(now_time, interval):
@@ -75,8 +74,7 @@ def user_in_range_of_feature(
         return True
 
     # Get the user's location
-    user_lon = user.profile.longitude
-    user_lat = user.profile.latitude
+    user_lat, user_lon = get_profile_location(user.profile)
 
     # get the feature's location
     feature_lon = feature_inst.longitude
@@ -87,6 +85,32 @@ def user_in_range_of_feature(
     return dist <= range_dist
 
 
+def claim_feature_reach(user: User, feature_inst: FeatureInstance, extra="") -> bool:
+    """
+    Record that a user reached a feature in the current window with a single INSERT.
+    The unique constraint on UserFeatureReach means only one of several concurrent claims
+    can succeed, so only the caller that gets True should award points.
+
+    @param user: The user reaching the feature.
+    @param feature_inst: The feature instance being reached.
+    @param extra: An extra field to tell apart different ways of reaching a feature.
+    @return: True if this call claimed the reach, False if it was already reached this window.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .models import UserFeatureReach  # avoid circular import
+
+    window_start, _ = get_current_window(timezone.now(), get_interval())
+
+    try:
+        with transaction.atomic():  # savepoint so a conflict doesn't break any outer transaction
+            UserFeatureReach.objects.create(
+                user=user, feature_instance=feature_inst, window_start=window_start, extra=extra
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
 def user_already_reached_in_window(
         user: User, feature_inst: FeatureInstance, extra="", update=True
 ) -> bool:
@@ -99,33 +123,43 @@ def user_already_reached_in_window(
     @param update: If True, will add a record if the user has not already reached the feature.
     @return: True if the user has reached the feature in the current window, False otherwise.
     """
-    # pylint: disable=import-outside-toplevel
-    from .models import UserFeatureReach, ChallengeSettings  # avoid circular import
-
-    # Get the current challenge settings for the interval
-    settings_obj = ChallengeSettings.get_solo()
-    interval = settings_obj.interval
+    if update:
+        return not claim_feature_reach(user, feature_inst, extra)
 
-    now_time = timezone.now()
-    window_start, window_end = get_current_window(now_time, interval)
+    # pylint: disable=import-outside-toplevel
+    from .models import UserFeatureReach  # avoid circular import
 
-    already_reached = UserFeatureReach.objects.filter(
+    window_start, _ = get_current_window(timezone.now(), get_interval())
+    return UserFeatureReach.objects.filter(
         user=user,
         feature_instance=feature_inst,
-        reached_at__gte=window_start,
-        reached_at__lt=window_end,
+        window_start=window_start,
         extra=extra,
     ).exists()
 
-    if not already_reached:
-        # add record and return true
-        if update:
-            UserFeatureReach.objects.create(
-                user=user, feature_instance=feature_inst, extra=extra
-            )
-        return False
 
-    return True
+def get_reached_feature_slugs(user: User, extra="") -> set[str]:
+    """
+    Get the slugs of all the features a user has already reached in the current window
+    in a single query.
+
+    @param user: The user to check.
+    @param extra: An extra field to check.
+    @return: A set of the reached feature instance slugs.
+    """
+    if user is None or not user.is_authenticated:
+        return set()
+
+    # pylint: disable=import-outside-toplevel
+    from .models import UserFeatureReach  # avoid circular import
+
+    window_start, _ = get_current_window(timezone.now(), get_interval())
+
+    return set(UserFeatureReach.objects.filter(
+        user=user,
+        window_start=window_start,
+        extra=extra,
+    ).values_list("feature_instance_id", flat=True))
 
 
 def user_reached_feature(user: User, feature_inst: FeatureInstance) -> None:
@@ -140,18 +174,17 @@ def user_reached_feature(user: User, feature_inst: FeatureInstance) -> None:
         print("User not in range of feature")
         return
 
-    if user_already_reached_in_window(user, feature_inst):
+    if not claim_feature_reach(user, feature_inst):
         print("User already reached feature in window")
         return
 
     # needed to avoid circular import
     # pylint: disable=import-outside-toplevel
+    from users.points import award_points
     from .models import ChallengeSettings
 
     points_for_feature = ChallengeSettings.get_solo().reached_feature_points
-
-    user.profile.points += points_for_feature
-    user.profile.save()
+    award_points(user, points_for_feature, "feature")
     reward_health = 20
     pet = user.pets.first()
     if pet:
@@ -172,30 +205,26 @@ def get_features_near(lat: float, lon: float, user=None, specific_feature=None)
     @return: A list of dictionaries representing the challenges near the given location.
     """
 
-    challenge_data: dict[FeatureInstance, str] = {}
-    all_features = FeatureInstance.objects.all()
+    # search the in-memory feature snapshot rather than querying every feature
+    snapshot = get_feature_snapshot()
+    mask = np.ones(len(snapshot), dtype=bool)
     if specific_feature:
-        all_features = all_features.filter(feature=specific_feature)
-
-    for feature in all_features:
-        if not user_already_reached_in_window(
-                user, feature, update=False):
-            dist = haversine(
-                lat,
-                lon,
-                feature.latitude,
-                feature.longitude)
-            dist_str = f"{dist / 1000.0:.2f}km away" if dist > 1 else f"{int(dist)}m away"
-            challenge_data[feature] = dist_str
-
-    # Sort the challenges by distance and get the 10 closest
-    sorted_challenges = sorted(challenge_data.items(), key=lambda x: x[1])
+        mask &= snapshot.feature_type_ids == specific_feature.id
+
+    # get everything the user has reached this window at once rather than per feature
+    reached_slugs = get_reached_feature_slugs(user)
+    if reached_slugs:
+        mask &= ~np.isin(snapshot.slugs, list(reached_slugs))
+
+    # Get the 10 closest challenges, sorted by distance
+    rows, distances = snapshot.nearest(lat, lon, 10, mask)
     return_challenges = []
-    for feature, dist in sorted_challenges[:10]:
+    for row, dist in zip(rows, distances):
+        dist_str = f"{dist / 1000.0:.2f}km away" if dist > 1 else f"{int(dist)}m away"
         return_challenges.append(
             {
-                "directions": dist,
-                "description": feature.name,
+                "directions": dist_str,
+                "description": snapshot.names[row],
             }
         )
     return return_challenges
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def populate_window_starts(apps, schema_editor):
+    """
+    Fill in the window each existing reach was made in, dropping any duplicate reaches
+    so the unique constraint can be added.
+    """
+    # pylint: disable=import-outside-toplevel
+    from challenges.challenge_helpers import get_current_window
+
+    challenge_settings = apps.get_model("challenges", "ChallengeSettings")
+    user_feature_reach = apps.get_model("challenges", "UserFeatureReach")
+
+    settings_obj = challenge_settings.objects.filter(pk=1).first()
+    interval = settings_obj.interval if settings_obj else timedelta(days=1)
+
+    seen = set()
+    duplicates = []
+    reaches = []
+    for reach in user_feature_reach.objects.order_by("reached_at", "pk"):
+        reach.window_start, _ = get_current_window(reach.reached_at, interval)
+        reach.extra = reach.extra or ""
+        key = (reach.user_id, reach.feature_instance_id, reach.window_start, reach.extra)
+        if key in seen:
+            duplicates.append(reach.pk)  # keep the earliest reach in each window
+            continue
+        seen.add(key)
+        reaches.append(reach)
+
+    user_feature_reach.objects.filter(pk__in=duplicates).delete()
+    user_feature_reach.objects.bulk_update(reaches, ["window_start", "extra"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("challenges", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userfeaturereach",
+            name="window_start",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(populate_window_starts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="userfeaturereach",
+            name="window_start",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="userfeaturereach",
+            name="extra",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name="userfeaturereach",
+            constraint=models.UniqueConstraint(
+                fields=("user", "feature_instance", "window_start", "extra"),
+                name="unique_feature_reach_per_window",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0002_userfeaturereach_window_start'),
+        ('locations', '0002_featureinstance_grid_cell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureReachHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('extra', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Feature reach history',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userfeaturereach',
+            index=models.Index(fields=['window_start'], name='challenges__window__eabbc3_idx'),
+        ),
+        migrations.AddField(
+            model_name='featurereachhistory',
+            name='feature_instance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='locations.featureinstance'),
+        ),
+        migrations.AddField(
+            model_name='featurereachhistory',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='featurereachhistory',
+            index=models.Index(fields=['day'], name='challenges__day_52df64_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='featurereachhistory',
+            constraint=models.UniqueConstraint(fields=('user', 'feature_instance', 'day', 'extra'), name='unique_feature_reach_history_day'),
+        ),
+    ]
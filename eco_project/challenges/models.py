@@ -9,8 +9,9 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils import timezone
 from locations.models import FeatureInstance
+from mysite.singleton_cache import bump_singleton_version, get_cached_singleton
 
-from .challenge_helpers import get_current_window  # make sure this helper works as expected
+from .challenge_helpers import get_current_window, get_interval
 
 User = get_user_model()
 
@@ -46,19 +47,32 @@ class ChallengeSettings(models.Model):
         """
         self.pk = 1
         super().save(*args, **kwargs)
+        bump_singleton_version(ChallengeSettings)
+
+    def delete(self, *args, **kwargs):
+        """
+        Override the delete method so cached copies of the settings are thrown away.
+
+        @param args: Additional arguments.
+        @param kwargs: Additional keyword
+        @return: The number of objects deleted
+        """
+        deleted = super().delete(*args, **kwargs)
+        bump_singleton_version(ChallengeSettings)
+        return deleted
 
     @classmethod
     def get_solo(cls):
         """
         Returns the single StreakSettings instance, creating it if there isnt one already.
+        The instance is cached per process until the settings are next saved.
 
         @return: The single StreakSettings instance.
         """
 
-        obj, _ = cls.objects.get_or_create(
+        return get_cached_singleton(cls, lambda: cls.objects.get_or_create(
             pk=1, defaults={"interval": timedelta(days=1)}
-        )
-        return obj
+        )[0])
 
     class Meta:
         """
@@ -125,12 +139,28 @@ class Streak(models.Model):
 class UserFeatureReach(models.Model):
     """
     This model holds the unique relationship of features that a user has reached.
+    A user can only reach each feature once per window, which the database enforces.
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     feature_instance = models.ForeignKey(
         FeatureInstance, on_delete=models.CASCADE)
     reached_at = models.DateTimeField(auto_now_add=True)
-    extra = models.CharField(max_length=20, blank=True, null=True)
+    # The start of the challenge window the feature was reached in
+    window_start = models.DateTimeField()
+    extra = models.CharField(max_length=20, blank=True, default="")
+
+    def save(self, *args, **kwargs):
+        """
+        Override the save method to fill in the window if it wasn't given.
+
+        @param args: Additional arguments.
+        @param kwargs: Additional keyword
+        @return: None
+        """
+        if self.window_start is None:
+            self.window_start, _ = get_current_window(
+                self.reached_at or timezone.now(), get_interval())
+        super().save(*args, **kwargs)
 
     def __str__(self):
         """
@@ -142,6 +172,54 @@ class UserFeatureReach(models.Model):
             f"{self.user.username} reached {self.feature_instance} at {self.reached_at}"
         )
 
+    class Meta:
+        """
+        Only allow one reach of each feature per user, window and extra.
+        """
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "feature_instance", "window_start", "extra"],
+                name="unique_feature_reach_per_window",
+            ),
+        ]
+        indexes = [models.Index(fields=["window_start"])]
+
+
+class FeatureReachHistory(models.Model):
+    """
+    This model archives how many times a user reached a feature on each day, so the reach
+    history is kept once old UserFeatureReach records are rolled up and removed.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    feature_instance = models.ForeignKey(
+        FeatureInstance, on_delete=models.CASCADE)
+    day = models.DateField()
+    extra = models.CharField(max_length=20, blank=True, default="")
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """
+        Override the string representation of this model.
+
+        @return: The string representation of this model.
+        """
+        return f"{self.user.username} reached {self.feature_instance} {self.count}x on {self.day}"
+
+    class Meta:
+        """
+        One row per user, feature, day and extra.
+        """
+
+        verbose_name_plural = "Feature reach history"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "feature_instance", "day", "extra"],
+                name="unique_feature_reach_history_day",
+            ),
+        ]
+        indexes = [models.Index(fields=["day"])]
+
 
 class Quiz(models.Model):
     """
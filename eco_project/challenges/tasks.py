@@ -4,31 +4,42 @@ This module contains tasks that are called by the scheduler.
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
 
+from collections import Counter
 from datetime import timedelta
 from django.utils import timezone
 from django.apps import apps
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, IntegerField, Value
+from django.db.models.functions import Cast, Floor, Greatest
 
-from .models import Streak, get_current_window, UserFeatureReach
+from .models import Streak, get_current_window, UserFeatureReach, FeatureReachHistory
 from .challenge_helpers import get_interval
 
 
-def update_challenges() -> None:
+def update_challenges() -> int:
     """
     Gets called every 1m by the scheduler to update any time dependent challenges.
 
-    @return: None
+    @return: The number of rows changed
     """
-    reset_missed_streaks()
-    cleanup_user_feature_reaches()
+    return reset_missed_streaks() + archive_user_feature_reaches()
+
 
+# The (window start, interval) that streaks were last reset for. Streaks can only be broken
+# when the window rolls over so there is nothing to do until this changes.
+_last_streak_reset_window = None  # pylint: disable=invalid-name
 
-def reset_missed_streaks() -> None:
+
+def reset_missed_streaks() -> int:
     """
-    Checks all Streak objects and resets raw_count for users who missed their check-in window.
+    Resets raw_count for users who missed their check-in window in a single UPDATE.
     The window is determined by the interval (from StreakSettings or default to 1 day).
+    Does nothing if the streaks have already been reset for the current window.
 
-    @return: None
+    @return: The number of streaks that were reset.
     """
+    global _last_streak_reset_window  # pylint: disable=global-statement
+
     now_time = timezone.now()
 
     interval = get_interval()
@@ -37,46 +48,117 @@ def reset_missed_streaks() -> None:
     current_window_start, _ = get_current_window(now_time, interval)
     previous_window_start = current_window_start - interval
 
-    count_reset = 0
-    for streak in Streak.objects.all():  # go through all streaks and reset if out of window
-        if streak.last_window not in [
-            previous_window_start,
-            current_window_start]:
-            streak.raw_count = 0
-            streak.save(update_fields=["raw_count"])
-            count_reset += 1
+    if _last_streak_reset_window == (current_window_start, interval):
+        return 0  # the window hasn't rolled over since the last reset
+
+    # reset every streak that isn't in the current or previous window in one go
+    count_reset = Streak.objects.filter(raw_count__gt=0).exclude(
+        last_window__in=[previous_window_start, current_window_start]
+    ).update(raw_count=0)
+
+    _last_streak_reset_window = (current_window_start, interval)
+    return count_reset
 
 
-def cleanup_user_feature_reaches() -> None:
+def archive_user_feature_reaches(batch_size: int = 1000) -> int:
     """
-    Deletes any UserFeatureReach record that is in a past window.
+    Rolls up every UserFeatureReach record from a past window into the daily
+    FeatureReachHistory counts and removes it, so the table the reach checks use stays small.
+    Records are moved in batches, each in its own transaction, to avoid one huge delete
+    when a window rolls over.
 
-    @return: None
+    @param batch_size: How many reach records to move per transaction
+    @return: The number of reach records archived
     """
-    now_time = timezone.now()
+    current_window_start, _ = get_current_window(timezone.now(), get_interval())
+
+    archived = 0
+    while True:
+        with transaction.atomic():
+            reaches = list(UserFeatureReach.objects.filter(
+                window_start__lt=current_window_start
+            ).order_by("pk").values_list(
+                "pk", "user_id", "feature_instance_id", "reached_at", "extra"
+            )[:batch_size])
+            if not reaches:
+                break
+
+            # count the reaches per (user, feature, day, extra)
+            counts = Counter(
+                (user_id, feature_id, timezone.localdate(reached_at), extra)
+                for _, user_id, feature_id, reached_at, extra in reaches
+            )
+            _add_reach_history(counts)
 
-    current_window_start, _ = get_current_window(now_time, get_interval())
+            UserFeatureReach.objects.filter(pk__in=[reach[0] for reach in reaches]).delete()
+        archived += len(reaches)
 
-    # Delete all records where reached_at is before the start of the current
-    UserFeatureReach.objects.filter(reached_at__lt=current_window_start).delete()
+    return archived
 
 
-def update_pet_health() -> None:
+def _add_reach_history(counts: Counter) -> None:
     """
-    Reduces the health of each Pet by 5% if created over 1 day ago,
-     ensuring health doesn't drop below zero.
+    Add reach counts onto the FeatureReachHistory rows, creating any that don't exist yet.
 
+    @param counts: A counter of (user id, feature instance id, day, extra) to reach count
     @return: None
     """
+    existing = {
+        (row.user_id, row.feature_instance_id, row.day, row.extra): row
+        for row in FeatureReachHistory.objects.filter(
+            user_id__in={key[0] for key in counts},
+            day__in={key[2] for key in counts},
+        )
+    }
+
+    to_update = []
+    to_create = []
+    for (user_id, feature_id, day, extra), count in counts.items():
+        row = existing.get((user_id, feature_id, day, extra))
+        if row is None:
+            to_create.append(FeatureReachHistory(
+                user_id=user_id, feature_instance_id=feature_id, day=day, extra=extra,
+                count=count))
+        else:
+            row.count += count
+            to_update.append(row)
+
+    FeatureReachHistory.objects.bulk_update(to_update, ["count"], batch_size=500)
+    FeatureReachHistory.objects.bulk_create(to_create, batch_size=500)
+
+
+def update_pet_health(max_periods: int = 30) -> int:
+    """
+    Reduces the health of each Pet by 5% (rounded down) for every full day since its health
+    last decayed, ensuring health doesn't drop below zero. Each day is applied as a single
+    UPDATE over all the pets that are due, so after downtime the missed days are caught up.
+
+    @param max_periods: The most days of decay to catch up on in one run
+    @return: The total number of pet health decays applied
+    """
 
     pet_model = apps.get_model('pets', 'Pet')
     now = timezone.now()
-    time_threshold = now - timedelta(days=1)  # Set to 1 day; adjust as needed
-
-    pets = pet_model.objects.filter(created_at__lte=time_threshold)
-    for pet in pets:
-        # Calculate new health by reducing current health by 5%
-        new_health = int(pet.health * 0.95)
-        # Ensure the health doesn't go below 0
-        pet.health = max(0, new_health)
-        pet.save()
+    decay_period = timedelta(days=1)  # Set to 1 day; adjust as needed
+
+    # new health is max(0, floor(health * 0.95)), the same as int(health * 0.95) for
+    # non-negative health
+    decayed_health = Greatest(
+        Cast(Floor(ExpressionWrapper(F("health") * 0.95, output_field=FloatField())),
+             output_field=IntegerField()),
+        Value(0),
+    )
+
+    total_decayed = 0
+    for _ in range(max_periods):
+        decayed = pet_model.objects.filter(
+            health_decayed_at__lte=now - decay_period
+        ).update(
+            health=decayed_health,
+            health_decayed_at=F("health_decayed_at") + decay_period,
+        )
+        total_decayed += decayed
+        if not decayed:  # every pet is up to date
+            break
+
+    return total_decayed
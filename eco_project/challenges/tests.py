@@ -10,8 +10,11 @@ from unittest.mock import patch, MagicMock
 
 from challenges.models import Streak, ChallengeSettings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 #pylint: disable=W0613,C0415,W0611
 
@@ -291,6 +294,62 @@ class ChallengesAPITests(TestCase):
             self.assertIn("directions", data["challenges"][0])
             self.assertIn("description", data["challenges"][0])
 
+    def test_nearest_challenges_api_skips_reached(self) -> None:
+        """
+        Reached features should be left out of the nearest challenges, and the number of
+        queries should not grow with the number of features.
+
+        @return: None
+        """
+        from locations.models import FeatureType, FeatureInstance
+        from challenges.models import UserFeatureReach
+
+        dummy_feature = FeatureType.objects.create(name="Dummy Feature")
+        reached = FeatureInstance.objects.create(
+            feature=dummy_feature, latitude=0.0, longitude=0.0,
+            name="Reached", slug="reached")
+        UserFeatureReach.objects.create(user=self.user, feature_instance=reached, extra="")
+
+        with CaptureQueriesContext(connection) as few_features:
+            response = self.client.get(reverse("challenges:get_nearby_challenges"))
+        self.assertEqual(response.json()["challenges"], [])
+
+        for i in range(3):
+            FeatureInstance.objects.create(
+                feature=dummy_feature, latitude=0.001 * i, longitude=0.0,
+                name=f"Challenge {i}", slug=f"challenge-{i}")
+
+        with CaptureQueriesContext(connection) as more_features:
+            response = self.client.get(reverse("challenges:get_nearby_challenges"))
+        descriptions = [c["description"] for c in response.json()["challenges"]]
+        self.assertEqual(descriptions, ["Challenge 0", "Challenge 1", "Challenge 2"])
+        self.assertEqual(len(few_features.captured_queries),
+                         len(more_features.captured_queries))
+
+    def test_claim_feature_reach_once_per_window(self) -> None:
+        """
+        Only the first claim of a feature in a window should succeed, and the database should
+        reject a second reach in the same window even if the claim is bypassed.
+
+        @return: None
+        """
+        from django.db import IntegrityError, transaction
+        from locations.models import FeatureType, FeatureInstance
+        from challenges.challenge_helpers import claim_feature_reach
+        from challenges.models import UserFeatureReach
+
+        dummy_feature = FeatureType.objects.create(name="Dummy Feature")
+        feature = FeatureInstance.objects.create(
+            feature=dummy_feature, latitude=0.0, longitude=0.0, name="Claimed", slug="claimed")
+
+        self.assertTrue(claim_feature_reach(self.user, feature))
+        self.assertFalse(claim_feature_reach(self.user, feature))
+        self.assertTrue(claim_feature_reach(self.user, feature, extra="question"))
+        self.assertEqual(UserFeatureReach.objects.filter(user=self.user).count(), 2)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserFeatureReach.objects.create(user=self.user, feature_instance=feature, extra="")
+
     def test_nearest_challenges_api_not_authenticated(self) -> None:
         """
         For an unauthenticated user, nearest_challenges_api should return an empty list
@@ -328,3 +387,173 @@ class ChallengesAPITests(TestCase):
 
         # assert streak created
         self.assertTrue(Streak.objects.filter(user=new_user).exists())
+
+
+class TasksTests(TestCase):
+    """
+    This class tests the scheduled tasks of the challenges app
+    """
+
+    def setUp(self) -> None:
+        """
+        Create users with streaks in the current, previous and an old window.
+
+        @return: None
+        """
+        from challenges import tasks
+        from challenges.challenge_helpers import get_current_window
+
+        tasks._last_streak_reset_window = None  # pylint: disable=protected-access
+        self.interval = ChallengeSettings.get_solo().interval
+        self.current_window, _ = get_current_window(timezone.now(), self.interval)
+
+        self.streaks = {}
+        for name, last_window in [
+            ("current", self.current_window),
+            ("previous", self.current_window - self.interval),
+            ("old", self.current_window - 3 * self.interval),
+            ("never", None),
+        ]:
+            user = User.objects.create_user(username=name, password="testpass")
+            Streak.objects.filter(user=user).update(raw_count=5, last_window=last_window)
+            self.streaks[name] = Streak.objects.get(user=user)
+
+    def test_reset_missed_streaks(self) -> None:
+        """
+        Only streaks outside the current and previous window should be reset, and running
+        again in the same window should not touch the database.
+
+        @return: None
+        """
+        from challenges.tasks import reset_missed_streaks
+
+        self.assertEqual(reset_missed_streaks(), 2)
+        counts = {name: Streak.objects.get(pk=streak.pk).raw_count
+                  for name, streak in self.streaks.items()}
+        self.assertEqual(counts, {"current": 5, "previous": 5, "old": 0, "never": 0})
+
+        with self.assertNumQueries(1):  # just the settings read for the interval
+            self.assertEqual(reset_missed_streaks(), 0)
+
+    def test_archive_user_feature_reaches(self) -> None:
+        """
+        Reaches from past windows should be rolled up into the daily history in batches and
+        removed, while reaches in the current window are left alone.
+
+        @return: None
+        """
+        from challenges.models import FeatureReachHistory, UserFeatureReach
+        from challenges.tasks import archive_user_feature_reaches
+        from locations.models import FeatureType, FeatureInstance
+
+        user = self.streaks["current"].user
+        feature_type = FeatureType.objects.create(name="Dummy Feature")
+        features = [
+            FeatureInstance.objects.create(
+                feature=feature_type, latitude=0.0, longitude=0.0, name=f"F{i}", slug=f"f-{i}")
+            for i in range(3)
+        ]
+        old_window = self.current_window - 2 * self.interval
+        old_day = timezone.localdate(old_window)
+        FeatureReachHistory.objects.create(
+            user=user, feature_instance=features[0], day=old_day, count=4)
+
+        for feature in features:
+            UserFeatureReach.objects.create(
+                user=user, feature_instance=feature, window_start=old_window)
+        UserFeatureReach.objects.filter(window_start=old_window).update(reached_at=old_window)
+        current = UserFeatureReach.objects.create(user=user, feature_instance=features[0])
+
+        self.assertEqual(archive_user_feature_reaches(batch_size=2), 3)
+        self.assertEqual(list(UserFeatureReach.objects.values_list("pk", flat=True)),
+                         [current.pk])
+        counts = dict(FeatureReachHistory.objects.filter(user=user, day=old_day)
+                      .values_list("feature_instance__slug", "count"))
+        self.assertEqual(counts, {"f-0": 5, "f-1": 1, "f-2": 1})
+
+        # nothing left to archive
+        self.assertEqual(archive_user_feature_reaches(), 0)
+
+    def test_update_pet_health_catches_up(self) -> None:
+        """
+        Pets should lose 5% (rounded down) of their health for each full day since they last
+        decayed, and pets that decayed less than a day ago should be left alone.
+
+        @return: None
+        """
+        from challenges.tasks import update_pet_health
+        from pets.models import Pet, PetType
+
+        pet_type = PetType.objects.create(name="Dog", description="Test Dog")
+        now = timezone.now()
+        pets = {}
+        for name, health, days_ago in [("three", 100, 3.5), ("one", 1, 1.5), ("new", 100, 0.5)]:
+            pets[name] = Pet.objects.create(
+                name=name, type=pet_type, owner=self.streaks["current"].user, health=health,
+                health_decayed_at=now - timedelta(days=days_ago))
+
+        self.assertEqual(update_pet_health(), 4)
+        health = {name: Pet.objects.get(pk=pet.pk).health for name, pet in pets.items()}
+        self.assertEqual(health, {"three": 85, "one": 0, "new": 100})
+
+        # already caught up so running again changes nothing
+        self.assertEqual(update_pet_health(), 0)
+        self.assertEqual(Pet.objects.get(pk=pets["three"].pk).health_decayed_at,
+                         now - timedelta(days=0.5))
+
+
+class ChallengeSettingsCacheTests(TransactionTestCase):
+    """
+    This class tests that the challenge endpoints read the cached challenge settings.
+    These run outside a transaction as the cache is skipped inside one.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create and log in a user and warm the settings cache.
+
+        @return: None
+        """
+        from mysite.singleton_cache import clear_singleton_cache
+
+        clear_singleton_cache()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        ChallengeSettings.get_solo().save()
+        ChallengeSettings.get_solo()  # load the saved version into the cache
+
+    def tearDown(self) -> None:
+        """
+        Forget the cached settings as the database is emptied after each test.
+
+        @return: None
+        """
+        from mysite.singleton_cache import clear_singleton_cache
+
+        clear_singleton_cache()
+
+    def test_endpoints_skip_settings_queries(self) -> None:
+        """
+        Once cached, the nearest challenges and streak endpoints should not query the settings.
+
+        @return: None
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("challenges:get_nearby_challenges"))
+            response = self.client.post(reverse("challenges:update_streak"))
+        self.assertEqual(response.json()["streak"], 1)
+
+        settings_queries = [query["sql"] for query in queries.captured_queries
+                            if "challenges_challengesettings" in query["sql"]]
+        self.assertEqual(settings_queries, [])
+
+    def test_saving_settings_invalidates_cache(self) -> None:
+        """
+        A saved change to the settings should be seen by the next read.
+
+        @return: None
+        """
+        settings = ChallengeSettings.get_solo()
+        settings.interval = timedelta(hours=2)
+        settings.save()
+        self.assertEqual(ChallengeSettings.get_solo().interval, timedelta(hours=2))
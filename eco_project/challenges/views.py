@@ -7,6 +7,7 @@ from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 
 from locations.models import LocationsAppSettings
+from users.location_updates import get_profile_location
 from .challenge_helpers import get_features_near
 from .models import Quiz, QuizAttempt
 
@@ -21,11 +22,11 @@ def challenges_home(request) -> HttpResponse:
 
     # get nearby location features
     # get user location if logged in else get default locations
-    lat = LocationsAppSettings.get_instance().default_lat
-    lon = LocationsAppSettings.get_instance().default_lon
+    map_settings = LocationsAppSettings.get_instance()
+    lat = map_settings.default_lat
+    lon = map_settings.default_lon
     if request.user.is_authenticated:
-        lat = request.user.profile.latitude
-        lon = request.user.profile.longitude
+        lat, lon = get_profile_location(request.user.profile)
 
     nearby_features = list(get_features_near(lat, lon))
 
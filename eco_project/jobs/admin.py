@@ -0,0 +1,70 @@
+"""
+Admin panel configuration for the jobs app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.contrib import admin
+
+from .models import JobLease, JobRun
+from .schedule import JOBS
+
+# job id -> interval in seconds
+JOB_INTERVALS = {job_id: interval.total_seconds() for job_id, _, interval in JOBS}
+
+
+class JobLeaseAdmin(admin.ModelAdmin):
+    """
+    Admin panel configuration for the JobLease model.
+    """
+
+    list_display = ("job_id", "owner", "expires_at")
+    readonly_fields = ("job_id", "owner")
+
+
+class JobRunAdmin(admin.ModelAdmin):
+    """
+    Admin panel configuration for the JobRun model.
+    Runs are only recorded by the scheduler so they can't be added or changed here.
+    """
+
+    list_display = ("job_id", "started_at", "status", "duration", "interval_used",
+                    "rows_affected")
+    list_filter = ("job_id", "status")
+    date_hierarchy = "started_at"
+
+    def interval_used(self, obj) -> str:
+        """
+        Display how much of the job's interval the run took.
+
+        @param obj: The job run.
+        @return: The percentage of the interval used, or "N/A" for unknown jobs.
+        """
+        interval = JOB_INTERVALS.get(obj.job_id)
+        if not interval:
+            return "N/A"
+        return f"{100 * obj.duration / interval:.1f}%"
+
+    interval_used.short_description = "Interval used"
+
+    def has_add_permission(self, request) -> bool:
+        """
+        Runs are only recorded by the scheduler.
+
+        @param request: The request object.
+        @return: False
+        """
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        """
+        Runs are only recorded by the scheduler.
+
+        @param request: The request object.
+        @param obj: The object being edited.
+        @return: False
+        """
+        return False
+
+
+admin.site.register(JobLease, JobLeaseAdmin)
+admin.site.register(JobRun, JobRunAdmin)
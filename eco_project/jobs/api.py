@@ -0,0 +1,23 @@
+"""
+This module contains the API views for the jobs app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .metrics import get_job_metrics
+from .schedule import JOBS
+
+
+@require_GET
+@staff_member_required
+def job_metrics(request) -> JsonResponse:
+    """
+    Get the metrics of every periodic job over the last 24 hours. Staff only.
+
+    @param request: The request object.
+    @return: The JSON response.
+    """
+    return JsonResponse({"jobs": get_job_metrics(JOBS)})
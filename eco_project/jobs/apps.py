@@ -0,0 +1,14 @@
+"""
+This file is used to configure the jobs app, which runs the periodic tasks of the other apps.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    """
+    Configuration class for the jobs app.
+    """
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
@@ -0,0 +1,84 @@
+"""
+This module hands out the database leases that stop more than one scheduler running a job.
+A lease is taken with a single conditional UPDATE, so when several schedulers race for it
+the database picks exactly one winner.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import os
+import socket
+import uuid
+from datetime import timedelta
+from functools import wraps
+from typing import Callable
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobLease
+
+# Identifies this scheduler process to the other ones
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(job_id: str, duration: timedelta, owner: str = OWNER_ID) -> bool:
+    """
+    Take or renew the lease on a job if nobody else holds it.
+
+    @param job_id: The job to lease
+    @param duration: How long the lease lasts
+    @param owner: Who is taking the lease
+    @return: True if the owner now holds the lease
+    """
+    now = timezone.now()
+    JobLease.objects.get_or_create(job_id=job_id, defaults={"expires_at": now})
+    return JobLease.objects.filter(job_id=job_id).filter(
+        Q(owner=owner) | Q(expires_at__lte=now)
+    ).update(owner=owner, expires_at=now + duration) == 1
+
+
+def release_lease(job_id: str, owner: str = OWNER_ID) -> None:
+    """
+    Give up the lease on a job so another scheduler can take it straight away.
+
+    @param job_id: The job to release
+    @param owner: Who is releasing the lease
+    @return: None
+    """
+    JobLease.objects.filter(job_id=job_id, owner=owner).update(expires_at=timezone.now())
+
+
+def _close_old_connections() -> None:
+    """
+    Close database connections that have timed out or errored, as Django does around each
+    request. Connections are left alone inside a transaction (such as in the tests).
+
+    @return: None
+    """
+    if not transaction.get_connection().in_atomic_block:
+        close_old_connections()
+
+
+def with_lease(job_id: str, duration: timedelta) -> Callable:
+    """
+    Make a job function only run when this scheduler holds the job's lease.
+    The lease is kept after the job finishes so the same scheduler keeps running the job,
+    and another scheduler only takes over once it has gone unrenewed for the lease duration.
+
+    @param job_id: The job to lease
+    @param duration: How long the lease lasts
+    @return: A decorator for the job function
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            _close_old_connections()  # the scheduler thread keeps its connection between runs
+            try:
+                if not acquire_lease(job_id, duration):
+                    return None
+                return func(*args, **kwargs)
+            finally:
+                _close_old_connections()
+        return wrapper
+    return decorator
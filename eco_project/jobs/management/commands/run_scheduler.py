@@ -0,0 +1,56 @@
+"""
+This script runs the periodic jobs of every app. Run one or more of these alongside the web
+server; the job leases make sure each job still only runs once per interval.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from apscheduler.schedulers.blocking import BlockingScheduler
+from django.core.management.base import BaseCommand
+from jobs.leases import release_lease
+from jobs.schedule import JOBS, add_jobs, leased_job
+
+
+class Command(BaseCommand):
+    """
+    This script is used to run the scheduled jobs.
+    """
+
+    help = "Run the periodic jobs (streaks, pet health, expired photos)"
+
+    def add_arguments(self, parser) -> None:
+        """
+        Add the optional arguments for the scheduler.
+
+        @param parser: The argument parser
+        @return: None
+        """
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Run every job once (if its lease is free) and exit")
+
+    def handle(self, *args, **kwargs) -> None:
+        """
+        This function is called when the run_scheduler script is run.
+
+        @param args: None expected
+        @param kwargs: The once argument
+        @return: None
+        """
+        if kwargs["once"]:
+            for job_id, func, interval in JOBS:
+                leased_job(job_id, func, interval)()
+                release_lease(job_id)
+            self.stdout.write(self.style.SUCCESS("Ran every job once"))
+            return
+
+        scheduler = BlockingScheduler()
+        add_jobs(scheduler)
+        self.stdout.write(f"Scheduling {len(JOBS)} jobs, press Ctrl+C to stop")
+        try:
+            scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            # let another scheduler take over straight away
+            for job_id, _, _ in JOBS:
+                release_lease(job_id)
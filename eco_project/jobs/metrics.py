@@ -0,0 +1,124 @@
+"""
+This module records how long each periodic job takes, how many rows it changes, and when the
+scheduler had to skip a run, and summarises the recent runs of every job.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import time
+from datetime import timedelta
+from functools import wraps
+from typing import Callable
+
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+
+from .models import JobRun
+
+# How long job runs are kept for
+JOB_RUN_RETENTION = timedelta(days=7)
+
+
+def record_runs(job_id: str) -> Callable:
+    """
+    Make a job function record each of its runs.
+    The number of rows affected is whatever the job function returns, if it is a number.
+
+    @param job_id: The id of the job
+    @return: A decorator for the job function
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started_at = timezone.now()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                JobRun.objects.create(
+                    job_id=job_id, started_at=started_at, status="failed",
+                    duration=time.perf_counter() - start, error=repr(error))
+                raise
+
+            JobRun.objects.create(
+                job_id=job_id, started_at=started_at, status="success",
+                duration=time.perf_counter() - start,
+                rows_affected=result if isinstance(result, int) else None)
+            return result
+        return wrapper
+    return decorator
+
+
+def record_skipped_run(job_id: str, status: str, scheduled_at=None) -> None:
+    """
+    Record that the scheduler skipped a run of a job.
+
+    @param job_id: The id of the job
+    @param status: Either "overlap" or "missed"
+    @param scheduled_at: When the run should have started (default now)
+    @return: None
+    """
+    JobRun.objects.create(job_id=job_id, started_at=scheduled_at or timezone.now(),
+                          status=status)
+
+
+def prune_job_runs() -> int:
+    """
+    Delete job runs older than the retention period.
+
+    @return: The number of runs deleted
+    """
+    deleted, _ = JobRun.objects.filter(
+        started_at__lt=timezone.now() - JOB_RUN_RETENTION).delete()
+    return deleted
+
+
+def get_job_metrics(jobs: list[tuple[str, Callable, timedelta]],
+                    window: timedelta = timedelta(hours=24)) -> list[dict]:
+    """
+    Summarise the recent runs of each job.
+
+    @param jobs: The (job id, function, interval) of each job to summarise
+    @param window: How far back to summarise
+    @return: A list of dicts of metrics, one per job
+    """
+    since = timezone.now() - window
+    success = Q(status="success")
+    stats = {
+        row["job_id"]: row for row in JobRun.objects.filter(started_at__gte=since)
+        .values("job_id").annotate(
+            runs=Count("pk", filter=success),
+            failures=Count("pk", filter=Q(status="failed")),
+            overlaps=Count("pk", filter=Q(status="overlap")),
+            misses=Count("pk", filter=Q(status="missed")),
+            average_duration=Avg("duration", filter=success),
+            max_duration=Max("duration", filter=success),
+        )
+    }
+    last_success = dict(JobRun.objects.filter(success).values("job_id")
+                        .annotate(last=Max("started_at")).values_list("job_id", "last"))
+
+    metrics = []
+    for job_id, _, interval in jobs:
+        job_stats = stats.get(job_id, {})
+        latest = JobRun.objects.filter(job_id=job_id, status__in=["success", "failed"]) \
+            .order_by("-started_at").first()
+        max_duration = job_stats.get("max_duration")
+        metrics.append({
+            "job_id": job_id,
+            "interval": interval.total_seconds(),
+            "last_run": latest.started_at.isoformat() if latest else None,
+            "last_status": latest.status if latest else None,
+            "last_duration": latest.duration if latest else None,
+            "last_rows_affected": latest.rows_affected if latest else None,
+            "last_success": last_success[job_id].isoformat() if job_id in last_success else None,
+            "runs": job_stats.get("runs", 0),
+            "failures": job_stats.get("failures", 0),
+            "overlaps": job_stats.get("overlaps", 0),
+            "misses": job_stats.get("misses", 0),
+            "average_duration": job_stats.get("average_duration"),
+            "max_duration": max_duration,
+            # how much of the interval the slowest run used, over 1 means runs overlap
+            "max_interval_used": (max_duration / interval.total_seconds()
+                                  if max_duration is not None else None),
+        })
+    return metrics
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLease',
+            fields=[
+                ('job_id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('owner', models.CharField(blank=True, max_length=200)),
+                ('expires_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
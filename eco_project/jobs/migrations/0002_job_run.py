@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=100)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration', models.FloatField(default=0)),
+                ('rows_affected', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('success', 'Succeeded'), ('failed', 'Failed'), ('overlap', 'Skipped, the previous run was still going'), ('missed', 'Missed its start time')], max_length=10)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job_id', '-started_at'], name='jobs_jobrun_job_id_bf1f4f_idx')],
+            },
+        ),
+    ]
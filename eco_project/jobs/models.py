@@ -0,0 +1,62 @@
+"""
+Models for the jobs app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class JobLease(models.Model):
+    """
+    This model is a lease on a periodic job. Only the scheduler holding an unexpired lease
+    runs the job, so it only runs once however many schedulers are running.
+    """
+
+    job_id = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=200, blank=True)
+    expires_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the lease.
+
+        @return: a string representation of the lease
+        """
+        return f"{self.job_id} held by {self.owner or 'nobody'} until {self.expires_at}"
+
+
+class JobRun(models.Model):
+    """
+    This model records each run of a periodic job, and each time the scheduler had to skip
+    one, so it can be seen when a job is getting close to its interval.
+    """
+
+    STATUS_CHOICES = [
+        ("success", "Succeeded"),
+        ("failed", "Failed"),
+        ("overlap", "Skipped, the previous run was still going"),
+        ("missed", "Missed its start time"),
+    ]
+
+    job_id = models.CharField(max_length=100)
+    started_at = models.DateTimeField(default=timezone.now)
+    duration = models.FloatField(default=0)  # in seconds
+    rows_affected = models.IntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    error = models.TextField(blank=True)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the run.
+
+        @return: a string representation of the run
+        """
+        return f"{self.job_id} at {self.started_at} ({self.status})"
+
+    class Meta:
+        """
+        Index the runs so the latest runs of each job can be found quickly.
+        """
+
+        indexes = [models.Index(fields=["job_id", "-started_at"])]
@@ -0,0 +1,71 @@
+"""
+This module lists every periodic job in the project and builds the scheduler that runs them.
+The jobs are run by the run_scheduler management command rather than by the web server.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from datetime import timedelta
+from typing import Callable
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
+from apscheduler.schedulers.base import BaseScheduler
+from challenges.tasks import update_challenges, update_pet_health
+from stories.tasks import remove_expired_photos
+
+from .leases import with_lease
+from .metrics import prune_job_runs, record_runs, record_skipped_run
+
+# (job id, job function, how often it runs)
+JOBS: list[tuple[str, Callable, timedelta]] = [
+    ("update_challenges_job", update_challenges, timedelta(minutes=1)),
+    ("update_pet_health_job", update_pet_health, timedelta(hours=24)),
+    ("remove_expired_photos_job", remove_expired_photos, timedelta(minutes=1)),
+    ("prune_job_runs_job", prune_job_runs, timedelta(hours=24)),
+]
+
+
+def leased_job(job_id: str, func: Callable, interval: timedelta) -> Callable:
+    """
+    Wrap a job function so only the scheduler holding its lease runs it, and each run
+    is recorded. The lease outlasts the interval so the holder keeps it from one run to the next.
+
+    @param job_id: The job id
+    @param func: The job function
+    @param interval: How often the job runs
+    @return: The wrapped job function
+    """
+    return with_lease(job_id, interval * 2)(record_runs(job_id)(func))
+
+
+def record_skipped_job(event: JobEvent) -> None:
+    """
+    Record a run the scheduler skipped, either because the previous run was still going or
+    because the scheduler was too busy to start it on time.
+
+    @param event: The scheduler event
+    @return: None
+    """
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        record_skipped_run(event.job_id, "overlap", event.scheduled_run_times[0])
+    else:
+        record_skipped_run(event.job_id, "missed", event.scheduled_run_time)
+
+
+def add_jobs(scheduler: BaseScheduler) -> None:
+    """
+    Add every job to a scheduler, and record any runs it skips.
+
+    @param scheduler: The scheduler to add the jobs to
+    @return: None
+    """
+    for job_id, func, interval in JOBS:
+        scheduler.add_job(
+            leased_job(job_id, func, interval),
+            "interval",
+            seconds=interval.total_seconds(),
+            id=job_id,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+    scheduler.add_listener(record_skipped_job, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
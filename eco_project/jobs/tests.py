@@ -0,0 +1,118 @@
+"""
+This module contains the tests for the jobs app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, JobSubmissionEvent
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .leases import acquire_lease, release_lease, with_lease
+from .metrics import get_job_metrics, record_runs
+from .models import JobLease, JobRun
+from .schedule import JOBS, record_skipped_job
+
+
+class LeaseTests(TestCase):
+    """
+    This class tests the job leases.
+    """
+
+    def test_only_one_owner_holds_a_lease(self) -> None:
+        """
+        A lease should only be taken by one owner until it expires or is released.
+
+        @return: None
+        """
+        self.assertTrue(acquire_lease("job", timedelta(minutes=2), owner="a"))
+        self.assertFalse(acquire_lease("job", timedelta(minutes=2), owner="b"))
+        self.assertTrue(acquire_lease("job", timedelta(minutes=2), owner="a"))  # renewal
+
+        release_lease("job", owner="b")  # not b's lease to release
+        self.assertFalse(acquire_lease("job", timedelta(minutes=2), owner="b"))
+
+        release_lease("job", owner="a")
+        self.assertTrue(acquire_lease("job", timedelta(minutes=2), owner="b"))
+
+        # an expired lease can be taken over
+        JobLease.objects.filter(job_id="job").update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(acquire_lease("job", timedelta(minutes=2), owner="a"))
+
+    def test_with_lease_skips_without_the_lease(self) -> None:
+        """
+        A leased job should only run when this scheduler can take the lease.
+
+        @return: None
+        """
+        func = MagicMock(return_value="ran")
+        job = with_lease("job", timedelta(minutes=2))(func)
+
+        self.assertEqual(job(), "ran")
+        JobLease.objects.filter(job_id="job").update(owner="someone else")
+        self.assertIsNone(job())
+        func.assert_called_once()
+
+    def test_run_scheduler_once(self) -> None:
+        """
+        Running the scheduler once should run every job and leave the leases free.
+
+        @return: None
+        """
+        call_command("run_scheduler", "--once", stdout=MagicMock())
+        self.assertEqual(JobLease.objects.count(), len(JOBS))
+        self.assertFalse(JobLease.objects.filter(expires_at__gt=timezone.now()).exists())
+        self.assertEqual(JobRun.objects.filter(status="success").count(), len(JOBS))
+
+
+class MetricsTests(TestCase):
+    """
+    This class tests the job run metrics.
+    """
+
+    def test_runs_are_recorded(self) -> None:
+        """
+        Successful, failed and skipped runs should all be recorded and summarised.
+
+        @return: None
+        """
+        job = record_runs("update_challenges_job")(MagicMock(return_value=7))
+        job()
+        failing = record_runs("update_challenges_job")(MagicMock(side_effect=ValueError("x")))
+        with self.assertRaises(ValueError):
+            failing()
+        record_skipped_job(JobSubmissionEvent(
+            EVENT_JOB_MAX_INSTANCES, "update_challenges_job", "default", [timezone.now()]))
+
+        metrics = {job["job_id"]: job for job in get_job_metrics(JOBS)}
+        challenges = metrics["update_challenges_job"]
+        self.assertEqual((challenges["runs"], challenges["failures"], challenges["overlaps"]),
+                         (1, 1, 1))
+        self.assertEqual(challenges["last_status"], "failed")
+        self.assertIsNotNone(challenges["last_success"])
+        self.assertEqual(challenges["interval"], 60)
+        self.assertLess(challenges["max_interval_used"], 1)
+        self.assertIsNone(metrics["update_pet_health_job"]["last_run"])
+
+    def test_metrics_api_is_staff_only(self) -> None:
+        """
+        Only staff should be able to see the job metrics.
+
+        @return: None
+        """
+        user = get_user_model().objects.create_user(username="user", password="testpass")
+        self.client.login(username="user", password="testpass")
+        self.assertEqual(self.client.get(reverse("jobs:metrics")).status_code, 302)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse("jobs:metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([job["job_id"] for job in response.json()["jobs"]],
+                         [job_id for job_id, _, _ in JOBS])
@@ -0,0 +1,14 @@
+"""
+This file contains the URL patterns for the jobs app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.urls import path
+
+from . import api
+
+app_name = "jobs"
+
+urlpatterns = [
+    path("api/metrics/", api.job_metrics, name="metrics"),
+]
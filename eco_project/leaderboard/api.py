@@ -0,0 +1,72 @@
+"""
+This module contains the API views for the leaderboard app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+from users.models import Profile
+
+from .ranking import (
+    get_friend_rank,
+    get_group_ranks,
+    get_leaderboard_around,
+    get_percentile,
+    get_rank,
+    get_user_count,
+)
+
+User = get_user_model()
+
+
+@require_GET
+def get_rank_data(request, username: Optional[str] = None) -> JsonResponse:
+    """
+    Get where a user sits on the global, friends and group leaderboards, without rendering
+    the whole leaderboard. Defaults to the logged-in user. For another user only the groups
+    the logged-in user is also in are included.
+
+    @param request: The request object.
+    @param username: The username of the user to rank (optional)
+    @return: The JSON response.
+    """
+    if not request.user.is_authenticated:  # handle non-signed in users
+        return JsonResponse({"error": "Not signed in"}, status=401)
+    if username is None:
+        username = request.user.username
+
+    profile = get_object_or_404(Profile.objects.select_related("user"), user__username=username)
+
+    rank = get_rank(profile.points)
+    total = get_user_count()
+    friend_rank, friend_total = get_friend_rank(profile)
+
+    return JsonResponse({
+        "username": profile.user.username,
+        "points": profile.points,
+        "global": {
+            "rank": rank,
+            "total": total,
+            "percentile": get_percentile(rank, total),
+            "neighbours": [
+                {"username": neighbour.user.username, "points": neighbour.points,
+                 "rank": neighbour.rank}
+                for neighbour in get_leaderboard_around(
+                    profile.user, radius=2, with_badges=False)
+            ],
+        },
+        "friends": {
+            "rank": friend_rank,
+            "total": friend_total,
+            "percentile": get_percentile(friend_rank, friend_total),
+        },
+        "groups": [
+            {**group, "percentile": get_percentile(group["rank"], group["member_count"])}
+            for group in get_group_ranks(
+                profile, viewer=None if profile.user_id == request.user.pk else request.user)
+        ],
+    })
@@ -12,3 +12,10 @@ class LeaderboardConfig(AppConfig):
     """
     default_auto_field = "django.db.models.BigAutoField"
     name = "leaderboard"
+
+    def ready(self):
+        """
+        This method is called when the app is ready to be used.
+        """
+        # pylint: disable=unused-import, import-outside-toplevel
+        import leaderboard.signals  # to keep the leaderboard in step with the profiles
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_leaderboard(apps, schema_editor):
+    """
+    Count how many users have each points total.
+    """
+    profile_model = apps.get_model("users", "Profile")
+    score_model = apps.get_model("leaderboard", "LeaderboardScore")
+    score_model.objects.bulk_create(
+        [score_model(points=row["points"], user_count=row["user_count"])
+         for row in profile_model.objects.order_by().values("points")
+         .annotate(user_count=Count("pk"))],
+        batch_size=500,
+    )
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0003_profile_points_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('points', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+"""
+Models for the leaderboard app.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.db import models
+
+
+class LeaderboardScore(models.Model):
+    """
+    This model is a materialized histogram of how many users have each points total.
+    It is kept up to date as points change so a user's rank can be found by summing the
+    counts above their score rather than counting every user.
+    """
+
+    points = models.PositiveIntegerField(primary_key=True)
+    user_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the score.
+
+        @return: a string representation of the score
+        """
+        return f"{self.user_count} users with {self.points} points"
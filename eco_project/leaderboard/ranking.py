@@ -0,0 +1,282 @@
+"""
+This module maintains and reads the materialized leaderboard.
+Ranks are competition ranks, so users with the same points share a rank.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from users.models import Profile, UserGroup
+
+from .models import LeaderboardScore
+
+User = get_user_model()
+
+TOP_GROUPS_CACHE_KEY = "leaderboard:top-groups"
+TOP_GROUPS_COUNT = 10
+
+
+def record_points_change(old_points: Optional[int], new_points: Optional[int]) -> None:
+    """
+    Move a user between scores in the leaderboard.
+
+    @param old_points: The user's previous points, or None if they are new
+    @param new_points: The user's new points, or None if they have been removed
+    @return: None
+    """
+    if old_points == new_points:
+        return
+
+    with transaction.atomic():
+        if old_points is not None:
+            LeaderboardScore.objects.filter(points=old_points, user_count__gt=0).update(
+                user_count=F("user_count") - 1)
+        if new_points is not None:
+            _add_user_at(new_points)
+
+    invalidate_group_rankings()
+
+
+def _add_user_at(points: int) -> None:
+    """
+    Count one more user with a points total, creating the score if nobody had it before.
+
+    @param points: The points total
+    @return: None
+    """
+    if LeaderboardScore.objects.filter(points=points).update(user_count=F("user_count") + 1):
+        return
+    try:
+        # a savepoint so losing a race to create the score doesn't break the outer transaction
+        with transaction.atomic():
+            LeaderboardScore.objects.create(points=points, user_count=1)
+    except IntegrityError:
+        # another award created it first so count this user on top
+        LeaderboardScore.objects.filter(points=points).update(user_count=F("user_count") + 1)
+
+
+def rebuild_leaderboard() -> int:
+    """
+    Rebuild the leaderboard from every profile's points.
+
+    @return: The number of distinct scores
+    """
+    counts = Profile.objects.order_by().values("points").annotate(user_count=Count("pk"))
+    with transaction.atomic():
+        LeaderboardScore.objects.all().delete()
+        LeaderboardScore.objects.bulk_create(
+            [LeaderboardScore(points=row["points"], user_count=row["user_count"])
+             for row in counts],
+            batch_size=500,
+        )
+    return len(counts)
+
+
+def get_rank(points: int) -> int:
+    """
+    Get the rank a points total has on the leaderboard.
+
+    @param points: The points total
+    @return: The rank, starting at 1
+    """
+    above = LeaderboardScore.objects.filter(points__gt=points).aggregate(
+        total=Coalesce(Sum("user_count"), 0))["total"]
+    return above + 1
+
+
+def get_user_count() -> int:
+    """
+    Get how many users are on the leaderboard.
+
+    @return: The number of users
+    """
+    return LeaderboardScore.objects.aggregate(
+        total=Coalesce(Sum("user_count"), 0))["total"]
+
+
+def get_percentile(rank: int, total: int) -> float:
+    """
+    Get the percentage of users that a rank is level with or ahead of.
+
+    @param rank: The rank, starting at 1
+    @param total: How many users are ranked
+    @return: The percentile from 0 to 100
+    """
+    if total <= 0:
+        return 100.0
+    return round(100 * (total - rank + 1) / total, 1)
+
+
+def get_friend_rank(profile: Profile) -> tuple[int, int]:
+    """
+    Get a user's rank among themselves and their friends with one query.
+
+    @param profile: The user's profile
+    @return: A tuple of (rank, number of users on the friends leaderboard)
+    """
+    counts = profile.friends.exclude(pk=profile.pk).aggregate(
+        above=Count("pk", filter=Q(points__gt=profile.points)),
+        total=Count("pk"),
+    )
+    return counts["above"] + 1, counts["total"] + 1
+
+
+def get_group_ranks(profile: Profile, viewer=None) -> list[dict]:
+    """
+    Get a user's rank in each of their groups with one query.
+    Group codes are the secret used to join a group so they are never included.
+
+    @param profile: The user's profile
+    @param viewer: If given, only the groups this user is also a member of are included
+    @return: A list of dicts with the name, rank and member count of each group
+    """
+    # filter on a subquery so the counts join over every member, not just this user
+    memberships = UserGroup.users.through.objects.filter(user_id=profile.user_id)
+    groups = UserGroup.objects.filter(code__in=memberships.values("usergroup_id"))
+    if viewer is not None:
+        viewer_memberships = UserGroup.users.through.objects.filter(user_id=viewer.pk)
+        groups = groups.filter(code__in=viewer_memberships.values("usergroup_id"))
+    groups = groups.annotate(
+        above=Count("users", filter=Q(users__profile__points__gt=profile.points)),
+        member_count=Count("users"),
+    ).order_by("name", "code").values("name", "above", "member_count")
+
+    return [
+        {"name": group["name"], "rank": group["above"] + 1,
+         "member_count": group["member_count"]}
+        for group in groups
+    ]
+
+
+def _ranked_profiles(profiles: list[Profile]) -> list[Profile]:
+    """
+    Set the rank of each profile in a contiguous slice of the leaderboard.
+    Only one query is needed as every profile between the first and last is in the slice.
+
+    @param profiles: The profiles, ordered by points (highest first) then user id
+    @return: The same profiles with a rank attribute
+    """
+    if not profiles:
+        return profiles
+
+    top_points = profiles[0].points
+    totals = LeaderboardScore.objects.aggregate(
+        above=Coalesce(Sum("user_count", filter=Q(points__gt=top_points)), 0),
+        at_or_above=Coalesce(Sum("user_count", filter=Q(points__gte=top_points)), 0),
+    )
+
+    # users below the top score are ranked after everyone on or above it
+    rank = totals["above"] + 1
+    passed = totals["at_or_above"]
+    previous_points = top_points
+    for profile in profiles:
+        if profile.points != previous_points:
+            rank = passed + 1
+            previous_points = profile.points
+        if profile.points != top_points:
+            passed += 1
+        profile.rank = rank
+    return profiles
+
+
+def _leaderboard_profiles(with_badges: bool = True):
+    """
+    Get the profiles in leaderboard order with what the leaderboard shows about them.
+
+    @param with_badges: Whether to load each user's badges too
+    @return: A queryset of profiles, highest points first
+    """
+    profiles = Profile.objects.select_related("user").order_by("-points", "user_id")
+    if with_badges:
+        profiles = profiles.prefetch_related("user__badgeinstance_set__badge")
+    return profiles
+
+
+def get_leaderboard_page(offset: int = 0, limit: int = 50) -> list[Profile]:
+    """
+    Get a page of the leaderboard.
+
+    @param offset: How many places to skip from the top
+    @param limit: The maximum number of profiles to return
+    @return: The profiles on the page, each with a rank attribute
+    """
+    return _ranked_profiles(list(_leaderboard_profiles()[offset:offset + limit]))
+
+
+def get_leaderboard_around(user: User, radius: int = 5,
+                           with_badges: bool = True) -> list[Profile]:
+    """
+    Get the part of the leaderboard around a user.
+
+    @param user: The user to centre the slice on
+    @param radius: How many places to include above and below the user
+    @param with_badges: Whether to load each user's badges too
+    @return: The profiles around and including the user's, each with a rank attribute
+    """
+    profile = Profile.objects.filter(user=user).only("points", "user_id").first()
+    if profile is None:
+        return []
+
+    points, user_id = profile.points, profile.user_id
+    above = list(_leaderboard_profiles(with_badges).filter(
+        Q(points__gt=points) | Q(points=points, user_id__lt=user_id)
+    ).order_by("points", "-user_id")[:radius])
+    below = list(_leaderboard_profiles(with_badges).filter(
+        Q(points__lt=points) | Q(points=points, user_id__gte=user_id)
+    )[:radius + 1])
+
+    return _ranked_profiles(above[::-1] + below)
+
+
+def get_top_groups() -> list[dict]:
+    """
+    Get the groups with the most points between their members. The ranking is worked out in
+    one aggregate query and then cached until membership or points change.
+
+    @return: A list of dicts with the code, name, total_points and member_count of each group
+    """
+    top_groups = cache.get(TOP_GROUPS_CACHE_KEY)
+    if top_groups is None:
+        top_groups = list(UserGroup.objects.annotate(
+            total_points=Coalesce(Sum("users__profile__points"), 0),
+            member_count=Count("users"),
+        ).order_by("-total_points", "code").values(
+            "code", "name", "total_points", "member_count"
+        )[:TOP_GROUPS_COUNT])
+        cache.set(TOP_GROUPS_CACHE_KEY, top_groups, timeout=None)
+    return top_groups
+
+
+def invalidate_group_rankings() -> None:
+    """
+    Throw away the cached group ranking once the current transaction commits.
+
+    @return: None
+    """
+    transaction.on_commit(lambda: cache.delete(TOP_GROUPS_CACHE_KEY))
+
+
+def get_group_leaderboards(user: User) -> list[dict]:
+    """
+    Get the leaderboard of each group a user is in, using a single query for all the members.
+
+    @param user: The user whose groups to get
+    @return: A list of dicts with the group and its users sorted by points
+    """
+    groups = list(UserGroup.objects.filter(users=user).order_by("name", "code"))
+    members = {group.code: [] for group in groups}
+
+    memberships = UserGroup.users.through.objects.filter(
+        usergroup__in=groups
+    ).select_related("user__profile").prefetch_related(
+        "user__badgeinstance_set__badge"
+    ).order_by("-user__profile__points", "user_id")
+    for membership in memberships:
+        members[membership.usergroup_id].append(membership.user)
+
+    return [{"group": group, "users": members[group.code]} for group in groups]
@@ -0,0 +1,70 @@
+"""
+This file contains signals that keep the materialized leaderboard in step with the profiles
+and the cached group ranking in step with the groups.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from users.models import Profile, UserGroup
+
+from .ranking import invalidate_group_rankings, record_points_change
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=Profile)
+def add_profile_to_leaderboard(sender, instance, created, **kwargs) -> None:
+    """
+    Add a new profile to the leaderboard.
+    Points changes on existing profiles are recorded by users.points.award_points.
+
+    @param sender: The sender of the signal
+    @param instance: The instance of the sender
+    @param created: Whether the instance was created
+    @param kwargs: Additional keyword arguments
+    @return: None
+    """
+    if created:
+        record_points_change(None, instance.points)
+
+
+@receiver(post_delete, sender=Profile)
+def remove_profile_from_leaderboard(sender, instance, **kwargs) -> None:
+    """
+    Remove a deleted profile from the leaderboard.
+
+    @param sender: The sender of the signal
+    @param instance: The instance of the sender
+    @param kwargs: Additional keyword arguments
+    @return: None
+    """
+    record_points_change(instance.points, None)
+
+
+@receiver(post_save, sender=UserGroup)
+@receiver(post_delete, sender=UserGroup)
+def group_changed(sender, instance, **kwargs) -> None:
+    """
+    Refresh the group ranking when a group is added, renamed or removed.
+
+    @param sender: The sender of the signal
+    @param instance: The instance of the sender
+    @param kwargs: Additional keyword arguments
+    @return: None
+    """
+    invalidate_group_rankings()
+
+
+@receiver(m2m_changed, sender=UserGroup.users.through)
+def group_membership_changed(sender, instance, action, **kwargs) -> None:
+    """
+    Refresh the group ranking when users join or leave a group.
+
+    @param sender: The sender of the signal
+    @param instance: The instance of the sender
+    @param action: The type of change to the membership
+    @param kwargs: Additional keyword arguments
+    @return: None
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_group_rankings()
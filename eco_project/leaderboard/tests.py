@@ -3,11 +3,29 @@ This module contains the test suite for the leaderboard app.
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
 from django.test import TestCase, Client
 from django.urls import reverse
 from pets.models import Pet, PetType
 from users.models import Profile, UserGroup
+from users.points import award_points
+
+from .models import LeaderboardScore
+from .ranking import (
+    TOP_GROUPS_CACHE_KEY,
+    get_group_leaderboards,
+    get_leaderboard_around,
+    get_leaderboard_page,
+    get_rank,
+    get_top_groups,
+    rebuild_leaderboard,
+    record_points_change,
+)
 
 User = get_user_model()
 
@@ -129,3 +147,167 @@ class LeaderboardViewTest(TestCase):
     #     self.assertEqual(response.status_code, 200)
     #     self.assertIsNone(response.context["selected_group"])
     #     self.assertEqual(list(response.context["group_users"]), [])
+
+
+class RankingTests(TestCase):
+    """
+    Test suite for the materialized leaderboard.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create users with points 30, 20, 20, 10 and 0.
+
+        @return: None
+        """
+        self.users = {}
+        for name, points in [("a", 30), ("b", 20), ("c", 20), ("d", 10), ("e", 0)]:
+            user = User.objects.create_user(username=name, password="testpass")
+            award_points(user, points, "adjustment")
+            self.users[name] = user
+
+    def test_scores_follow_points(self) -> None:
+        """
+        The materialized scores should match the profiles after awards and rebuilds.
+
+        @return: None
+        """
+        expected = {30: 1, 20: 2, 10: 1, 0: 1}
+        scores = dict(LeaderboardScore.objects.filter(user_count__gt=0)
+                      .values_list("points", "user_count"))
+        self.assertEqual(scores, expected)
+
+        rebuild_leaderboard()
+        scores = dict(LeaderboardScore.objects.values_list("points", "user_count"))
+        self.assertEqual(scores, expected)
+
+    def test_new_score_race(self) -> None:
+        """
+        Two users reaching a new points total at the same time should both be counted,
+        without an error rolling back the award.
+
+        @return: None
+        """
+        original_update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # the other award creates the score between this update and the create
+            if queryset.model is LeaderboardScore and not LeaderboardScore.objects.filter(
+                    points=55).exists():
+                LeaderboardScore.objects.create(points=55, user_count=1)
+                return 0
+            return original_update(queryset, **kwargs)
+
+        with transaction.atomic(), patch.object(QuerySet, "update", racing_update):
+            record_points_change(None, 55)
+        self.assertEqual(LeaderboardScore.objects.get(points=55).user_count, 2)
+
+    def test_page_ranks(self) -> None:
+        """
+        Pages should be in points order with tied users sharing a rank.
+
+        @return: None
+        """
+        self.assertEqual(get_rank(20), 2)
+        self.assertEqual(get_rank(10), 4)
+
+        top = get_leaderboard_page(0, 3)
+        self.assertEqual([(p.user.username, p.rank) for p in top],
+                         [("a", 1), ("b", 2), ("c", 2)])
+
+        with self.assertNumQueries(3):  # profiles, badges and ranks
+            rest = get_leaderboard_page(2, 10)
+        self.assertEqual([(p.user.username, p.rank) for p in rest],
+                         [("c", 2), ("d", 4), ("e", 5)])
+
+    def test_around_me(self) -> None:
+        """
+        The slice around a user should include the users either side with their ranks.
+
+        @return: None
+        """
+        around = get_leaderboard_around(self.users["c"], radius=1)
+        self.assertEqual([(p.user.username, p.rank) for p in around],
+                         [("b", 2), ("c", 2), ("d", 4)])
+
+        award_points(self.users["d"], 25, "adjustment")
+        around = get_leaderboard_around(self.users["d"], radius=2)
+        self.assertEqual([(p.user.username, p.rank) for p in around],
+                         [("d", 1), ("a", 2), ("b", 3)])
+
+    def test_group_rankings(self) -> None:
+        """
+        The top groups should be worked out in one query, cached, and refreshed when
+        membership or points change.
+
+        @return: None
+        """
+        cache.delete(TOP_GROUPS_CACHE_KEY)
+        small = UserGroup.objects.create(name="Small", code="SMALL")
+        big = UserGroup.objects.create(name="Big", code="BIG")
+        small.users.add(self.users["a"])
+        big.users.add(self.users["b"], self.users["c"], self.users["d"])
+        cache.delete(TOP_GROUPS_CACHE_KEY)
+
+        with self.assertNumQueries(1):
+            top = get_top_groups()
+        self.assertEqual([(g["name"], g["total_points"], g["member_count"]) for g in top],
+                         [("Big", 50, 3), ("Small", 30, 1)])
+        with self.assertNumQueries(0):
+            get_top_groups()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            award_points(self.users["a"], 40, "adjustment")
+        self.assertEqual(get_top_groups()[0]["name"], "Small")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            small.users.add(self.users["e"])
+        self.assertEqual(get_top_groups()[0]["member_count"], 2)
+
+        with self.assertNumQueries(3):  # groups, members and badges
+            leaderboards = get_group_leaderboards(self.users["c"])
+        self.assertEqual([entry["group"] for entry in leaderboards], [big])
+        self.assertEqual([user.username for user in leaderboards[0]["users"]], ["b", "c", "d"])
+        cache.delete(TOP_GROUPS_CACHE_KEY)
+
+    def test_rank_api(self) -> None:
+        """
+        The rank API should give the user's global, friends and group standing in a fixed
+        number of queries.
+
+        @return: None
+        """
+        group = UserGroup.objects.create(name="Group", code="GROUP")
+        group.users.add(self.users["a"], self.users["c"])
+        profile_c = Profile.objects.get(user=self.users["c"])
+        profile_c.friends.add(Profile.objects.get(user=self.users["d"]))
+
+        response = self.client.get(reverse("leaderboard:rank"))
+        self.assertEqual(response.status_code, 401)
+
+        self.client.login(username="c", password="testpass")
+        with self.assertNumQueries(11):  # session, user, profile, ranks and neighbours
+            response = self.client.get(reverse("leaderboard:rank"))
+        data = response.json()
+        self.assertEqual(data["points"], 20)
+        self.assertEqual(data["global"]["rank"], 2)
+        self.assertEqual(data["global"]["total"], 5)
+        self.assertEqual(data["global"]["percentile"], 80.0)
+        self.assertEqual([n["username"] for n in data["global"]["neighbours"]],
+                         ["a", "b", "c", "d", "e"])
+        self.assertEqual(data["friends"], {"rank": 1, "total": 2, "percentile": 100.0})
+        self.assertEqual(data["groups"], [{"name": "Group", "rank": 2,
+                                           "member_count": 2, "percentile": 50.0}])
+
+        # other users' groups are only shown if the logged-in user is in them too
+        other = UserGroup.objects.create(name="Other", code="OTHER")
+        other.users.add(self.users["a"])
+        response = self.client.get(reverse("leaderboard:user_rank", args=["a"]))
+        self.assertEqual([group["name"] for group in response.json()["groups"]], ["Group"])
+        response = self.client.get(reverse("leaderboard:user_rank", args=["e"]))
+        self.assertEqual(response.json()["global"]["rank"], 5)
+        self.assertEqual(response.json()["groups"], [])
+
+        self.client.logout()
+        response = self.client.get(reverse("leaderboard:user_rank", args=["a"]))
+        self.assertEqual(response.status_code, 401)
@@ -5,10 +5,13 @@ This file contains the URL patterns for the leaderboard app.
 """
 from django.urls import path
 
+from . import api
 from .views import leaderboard_view
 
 app_name = "leaderboard"
 
 urlpatterns = [
     path("", leaderboard_view, name="leaderboard"),
+    path("api/rank/", api.get_rank_data, name="rank"),
+    path("api/rank/<str:username>/", api.get_rank_data, name="user_rank"),
 ]
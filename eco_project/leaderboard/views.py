@@ -6,50 +6,56 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.shortcuts import render
 from pets.models import Pet
-from users.models import UserGroup
+
+from .ranking import get_group_leaderboards, get_leaderboard_around, get_leaderboard_page, \
+    get_top_groups
 
 User = get_user_model()
 
+LEADERBOARD_PAGE_SIZE = 50
+
+
+def _ranked_users(profiles) -> list:
+    """
+    Get the users of ranked profiles, with each user's rank copied onto it for the template.
+
+    @param profiles: The ranked profiles
+    @return: The users in the same order
+    """
+    users = []
+    for profile in profiles:
+        profile.user.rank = profile.rank
+        users.append(profile.user)
+    return users
+
 
 @login_required
 def leaderboard_view(request) -> HttpResponse:
     """
     View to render the leaderboard page, showing the top users, pets, groups, and friends.
+    The top users are read a page at a time from the materialized leaderboard.
     """
-    top_users = User.objects.prefetch_related('pets').all()
-    # sort top_users by profile.points
-    top_users = sorted(top_users, key=lambda user: user.profile.points, reverse=True)
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
 
-    pets = Pet.objects.order_by("-health")[:10]
-
-    user_groups = UserGroup.objects.filter(users=request.user)
-
-    # Get all groups and calculate their total points
-    all_groups = UserGroup.objects.all().prefetch_related('users', 'users__pets', 'users__profile')
-    top_groups = []
+    # fetch one extra to know if there is another page
+    top_profiles = get_leaderboard_page(
+        (page - 1) * LEADERBOARD_PAGE_SIZE, LEADERBOARD_PAGE_SIZE + 1)
+    has_next_page = len(top_profiles) > LEADERBOARD_PAGE_SIZE
+    top_users = _ranked_users(top_profiles[:LEADERBOARD_PAGE_SIZE])
 
-    for group in all_groups:
-        group_users = User.objects.filter(usergroup=group).prefetch_related('pets', 'profile')
-        total_group_points = sum(user.profile.points for user in group_users)
-        top_groups.append({
-            'group': group,
-            'total_points': total_group_points,
-            'member_count': group_users.count()
-        })
+    # show where the user is if they aren't on this page
+    around_me = []
+    if request.user not in top_users:
+        around_me = _ranked_users(get_leaderboard_around(request.user))
 
-    # Sort groups by total points
-    top_groups = sorted(top_groups, key=lambda g: g['total_points'], reverse=True)[:10]
-
-    group_leaderboards = []
-    for group in user_groups:
-        group_users = User.objects.filter(usergroup=group).prefetch_related('pets')
-
-        sorted_users = sorted(group_users, key=lambda u: u.profile.points, reverse=True)
+    pets = Pet.objects.order_by("-health")[:10]
 
-        group_leaderboards.append({
-            'group': group,
-            'users': sorted_users,
-        })
+    group_leaderboards = get_group_leaderboards(request.user)
+    user_groups = [entry["group"] for entry in group_leaderboards]
+    top_groups = get_top_groups()
 
     # Build the friend leaderboard: include yourself and your friends
     friend_profiles = request.user.profile.friends.all()
@@ -60,6 +66,9 @@ def leaderboard_view(request) -> HttpResponse:
 
     context = {
         "users": top_users,
+        "around_me": around_me,
+        "page": page,
+        "has_next_page": has_next_page,
         "pets": pets,
         "user_groups": user_groups,
         "group_leaderboards": group_leaderboards,
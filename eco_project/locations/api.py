@@ -4,6 +4,7 @@ This file contains the API endpoints for the Locations app
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
 import json
+import math
 
 from django.http import JsonResponse
 from django.shortcuts import redirect
@@ -11,16 +12,36 @@ from django.urls import reverse
 from django.views.decorators.http import require_POST
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from users.location_updates import get_profile_location
 
-from .chunk_handling import get_nearby_tiles
+from .feature_snapshot import get_feature_snapshot
+from .map_data_version import map_data_cached
 from .models import (
     FeatureInstance,
-    Map3DChunk,
     LocationsAppSettings,
     FeatureInstanceTileMap,
 )
+from .tile_grid import get_nearby_tiles, get_tile_grid
 
 
+def _get_search_params(request) -> tuple[float, float, float]:
+    """
+    Read the lat, lon and distance of a tile search from a GET request.
+
+    @param request: The GET request object
+    @return: A tuple of (lat, lon, distance in meters)
+    @raise ValueError: If a parameter is missing, not a finite number or the distance is negative
+    @raise TypeError: If lat or lon is missing
+    """
+    lat = float(request.GET.get("lat"))
+    lon = float(request.GET.get("lon"))
+    max_distance = float(request.GET.get("distance", 100))
+    if not all(math.isfinite(value) for value in (lat, lon, max_distance)) or max_distance < 0:
+        raise ValueError("Search parameters must be finite and the distance positive")
+    return lat, lon, max_distance
+
+
+@map_data_cached
 @api_view(["GET"])
 def nearby_tiles(request) -> Response:
     """
@@ -31,29 +52,18 @@ def nearby_tiles(request) -> Response:
     """
     try:
         # Get the lat, lon and distance from the GET request
-        lat = float(request.GET.get("lat"))
-        lon = float(request.GET.get("lon"))
-        max_distance = float(request.GET.get("distance", 100))
-
-        tiles = get_nearby_tiles(lat, lon, max_distance)  # Get tiles
-
-        # Create a response with the list of tiles
-        response_data = [
-            {
-                "id": tile.id,
-                "file": tile.file.url,
-                "lat": tile.center_lat,
-                "lon": tile.center_lon,
-            }
-            for tile in tiles
-        ]
+        lat, lon, max_distance = _get_search_params(request)
+
+        # Get the tiles from the in-memory tile grid
+        response_data = get_nearby_tiles(lat, lon, max_distance)
 
         return Response(response_data, status=200)
 
-    except (TypeError, ValueError):
+    except (TypeError, ValueError, OverflowError):
         return Response({"error": "Invalid parameters"}, status=400)
 
 
+@map_data_cached
 @api_view(["GET"])
 def get_features_for_tiles(request) -> Response:
     """
@@ -73,34 +83,82 @@ def get_features_for_tiles(request) -> Response:
     except ValueError:
         return Response({"error": "Invalid tile IDs provided."}, status=400)
 
-    # Get tile objects from the IDs
-    tiles = Map3DChunk.objects.filter(id__in=tile_ids)
+    # Get the tiles' file URLs from the tile grid rather than the database
+    grid = get_tile_grid()
+    tile_ids = sorted({tile_id for tile_id in tile_ids if tile_id in grid.index_of_id})
 
     # Build the response data dictionary: key = tile file URL, value = list of
-    # feature details
-    response_data = {}
-
-    for tile in tiles:
-        features_in_tile = []
-        # Get the mapping objects for this tile
-        tile_mappings = FeatureInstanceTileMap.objects.filter(map_chunk=tile)
-        for mapping in tile_mappings:
-            instance = mapping.feature_instance
-            features_in_tile.append(
-                {
-                    "lat": instance.latitude,
-                    "lon": instance.longitude,
-                    "colour": instance.feature.colour,
-                    "mesh_url": instance.feature.feature_mesh.url
-                    if instance.feature.feature_mesh
-                    else "None",
-                }
-            )
-        response_data[tile.file.url] = features_in_tile
+    # feature details read from the feature snapshot
+    markers_by_tile = get_markers_for_tiles(tile_ids)
+    response_data = {
+        grid.files[grid.index_of_id[tile_id]]: markers_by_tile[tile_id] for tile_id in tile_ids
+    }
+
+    return Response(response_data, status=200)
+
+
+def get_markers_for_tiles(tile_ids: list[int]) -> dict[int, list[dict]]:
+    """
+    Get the markers of the features on each of the given tiles.
+
+    @param tile_ids: The IDs of the tiles
+    @return: A dictionary of tile ID to the list of markers on that tile
+    """
+    # Get which features are in which of the tiles in one query, whatever the number of tiles
+    slugs_by_tile: dict[int, list[str]] = {tile_id: [] for tile_id in tile_ids}
+    for tile_id, slug in FeatureInstanceTileMap.objects.filter(
+            map_chunk_id__in=tile_ids).values_list("map_chunk_id", "feature_instance_id"):
+        slugs_by_tile[tile_id].append(slug)
+
+    # Read the feature details from the feature snapshot
+    snapshot = get_feature_snapshot()
+    return {
+        tile_id: [
+            snapshot.marker(snapshot.index_of_slug[slug])
+            for slug in slugs
+            if slug in snapshot.index_of_slug
+        ]
+        for tile_id, slugs in slugs_by_tile.items()
+    }
 
+
+@map_data_cached
+@api_view(["GET"])
+def map_viewport(request) -> Response:
+    """
+    This function returns everything the 3D map needs to move to a location in one request:
+    the tiles in range, which of them the client still needs to load, which of the tiles it
+    already has should be unloaded, and the feature markers on the tiles it needs to load.
+    Expects GET parameters lat, lon, distance and optionally "loaded", a comma-separated
+    list of the tile IDs the client already has.
+
+    @param request: The GET request object.
+    @return: The JSON response containing the tiles, load, unload and features.
+    """
+    try:
+        lat, lon, max_distance = _get_search_params(request)
+        loaded_param = request.GET.get("loaded")
+        loaded = {int(i) for i in loaded_param.split(",")} if loaded_param else set()
+        tiles = get_nearby_tiles(lat, lon, max_distance)
+    except (TypeError, ValueError, OverflowError):
+        return Response({"error": "Invalid parameters"}, status=400)
+
+    tile_ids = {tile["id"] for tile in tiles}
+    load = [tile for tile in tiles if tile["id"] not in loaded]
+
+    # Only look up the features for the tiles the client is about to load
+    markers_by_tile = get_markers_for_tiles([tile["id"] for tile in load]) if load else {}
+
+    response_data = {
+        "tiles": tiles,
+        "load": [tile["id"] for tile in load],
+        "unload": sorted(loaded - tile_ids),
+        "features": {tile["file"]: markers_by_tile[tile["id"]] for tile in load},
+    }
     return Response(response_data, status=200)
 
 
+@map_data_cached
 @api_view(["GET"])
 def api_get_map_data(request) -> Response:
     """
@@ -111,24 +169,25 @@ def api_get_map_data(request) -> Response:
     """
 
     # Get the map settings data from the LocationsAppSettings model
-    min_lat = LocationsAppSettings.get_instance().min_lat
-    max_lat = LocationsAppSettings.get_instance().max_lat
-    min_lon = LocationsAppSettings.get_instance().min_lon
-    max_lon = LocationsAppSettings.get_instance().max_lon
+    map_settings = LocationsAppSettings.get_instance()
+    min_lat = map_settings.min_lat
+    max_lat = map_settings.max_lat
+    min_lon = map_settings.min_lon
+    max_lon = map_settings.max_lon
 
-    min_x = LocationsAppSettings.get_instance().min_world_x
-    max_x = LocationsAppSettings.get_instance().max_world_x
+    min_x = map_settings.min_world_x
+    max_x = map_settings.max_world_x
 
-    min_y = LocationsAppSettings.get_instance().min_world_y
-    max_y = LocationsAppSettings.get_instance().max_world_y
+    min_y = map_settings.min_world_y
+    max_y = map_settings.max_world_y
 
-    min_z = LocationsAppSettings.get_instance().min_world_z
-    max_z = LocationsAppSettings.get_instance().max_world_z
+    min_z = map_settings.min_world_z
+    max_z = map_settings.max_world_z
 
-    camera_map_url = LocationsAppSettings.get_instance().camera_z_map.url
+    camera_map_url = map_settings.camera_z_map.url
 
-    bg_colour = LocationsAppSettings.get_instance().world_colour
-    render_dist = LocationsAppSettings.get_instance().render_dist
+    bg_colour = map_settings.world_colour
+    render_dist = map_settings.render_dist
 
     # Create a response with the map settings data
     response_data = [
@@ -163,21 +222,20 @@ def get_current_location(request) -> Response:
     """
 
     # get default lat and lon
-    default_lat = LocationsAppSettings.get_instance().default_lat
-    default_lon = LocationsAppSettings.get_instance().default_lon
+    map_settings = LocationsAppSettings.get_instance()
+    default_lat = map_settings.default_lat
+    default_lon = map_settings.default_lon
     # get the user's current location from the user object
     if request.user.is_authenticated:
-        current_user = request.user
-        lat = current_user.profile.latitude
-        lon = current_user.profile.longitude
+        lat, lon = get_profile_location(request.user.profile)
     else:  # if the user is not signed in, return main campus location
         lat, lon = default_lat, default_lon
 
     # find out if user is within map bounds
-    min_lat = LocationsAppSettings.get_instance().min_lat
-    max_lat = LocationsAppSettings.get_instance().max_lat
-    min_lon = LocationsAppSettings.get_instance().min_lon
-    max_lon = LocationsAppSettings.get_instance().max_lon
+    min_lat = map_settings.min_lat
+    max_lat = map_settings.max_lat
+    min_lon = map_settings.min_lon
+    max_lon = map_settings.max_lon
     in_bounds = min_lat < lat < max_lat and min_lon < lon < max_lon
 
     if not in_bounds:  # if not in bounds return main campus location
@@ -186,6 +244,7 @@ def get_current_location(request) -> Response:
     return Response({"lat": lat, "lon": lon}, status=200)
 
 
+@map_data_cached
 @api_view(["GET"])
 def get_feature_instances(request) -> Response:
     """
@@ -194,17 +253,10 @@ def get_feature_instances(request) -> Response:
     @param request: The GET request object. No data to read here.
     @return: A JSON response containing all feature instances.
     """
-    feature_instances = FeatureInstance.objects.all()
+    snapshot = get_feature_snapshot()
 
     # for each feature instance, return its lat, lon, featureType.colour
-    response_data = [
-        {
-            "lat": instance.latitude,
-            "lon": instance.longitude,
-            "colour": instance.feature.colour,
-        }
-        for instance in feature_instances
-    ]
+    response_data = [snapshot.marker(i, include_mesh=False) for i in range(len(snapshot))]
 
     return Response(response_data, status=200)
 
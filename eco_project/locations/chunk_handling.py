@@ -5,9 +5,15 @@ This module contains functions for handling 3D map tiles and other geodesic calc
 """
 import math
 
-from django.db.models import Q
+import numpy as np
 
-from .models import Map3DChunk
+EARTH_RADIUS = 6371000  # Earth's radius in meters
+
+# Size of a spatial grid cell in degrees (~550m north to south)
+GRID_CELL_SIZE = 0.005
+
+# The furthest (in cells) the ring search will look before scanning everything
+MAX_GRID_RINGS = 64
 
 
 def haversine(lat1, lon1, lat2, lon2) -> float:
@@ -22,7 +28,6 @@ def haversine(lat1, lon1, lat2, lon2) -> float:
     @return: The distance between the two points in meters
     """
 
-    earth_rad = 6371000  # Earth's radius in meters
     lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
 
     delta_lat = lat2 - lat1
@@ -33,41 +38,68 @@ def haversine(lat1, lon1, lat2, lon2) -> float:
     )
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
-    return earth_rad * c  # Distance in meters
+    return EARTH_RADIUS * c  # Distance in meters
+
+
+def haversine_many(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """
+    A vectorised version of the haversine formula. Calculates the distance in meters from one
+    point to every point in a table of latitudes and longitudes in one go.
+
+    @param lat: Input latitude of the point to measure from
+    @param lon: Input longitude of the point to measure from
+    @param lats: Array (or list) of latitudes to measure to
+    @param lons: Array (or list) of longitudes to measure to
+    @return: A numpy array of the distances in meters, in the same order as the input
+    """
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS * c  # Distance in meters
 
 
-def get_nearby_tiles(lat, lon, max_distance_meters=100):
+def get_grid_cell(lat: float, lon: float) -> tuple[int, int]:
     """
-    Get all 3D map chunks within a certain distance of a given latitude and longitude.
+    Get the spatial grid cell that a latitude and longitude falls into.
 
     @param lat: The input latitude  (y)
     @param lon: The input longitude (x)
-    @param max_distance_meters: The maximum distance in meters to search for
-     nearby tiles (default 100)
-    @return: The list of nearby 3D map chunks
+    @return: The (row, column) of the grid cell
     """
+    return math.floor(lat / GRID_CELL_SIZE), math.floor(lon / GRID_CELL_SIZE)
 
-    # Create a bounding box that the tiles center lat/lon must be within
-    # Those bounds will be center + these offsets
-    lat_offset = max_distance_meters / 111320  # 1 degree is roughly 111.32 km
-    lon_offset = max_distance_meters / (111320 * math.cos(math.radians(lat)))
-
-    # Filter using Q objects to get the chunks within bounds this is hopefully
-    # lots faster than using a loop
-    bounded_chunks = Map3DChunk.objects.filter(
-        Q(center_lat__gte=lat - lat_offset)
-        & Q(center_lat__lte=lat + lat_offset)
-        & Q(center_lon__gte=lon - lon_offset)
-        & Q(center_lon__lte=lon + lon_offset)
-    )
 
-    # Actually check the bounded chunks to see if they are within the max
-    # distance
-    nearby_chunks = [
-        chunk
-        for chunk in bounded_chunks
-        if haversine(lat, lon, chunk.center_lat, chunk.center_lon)
-        <= max_distance_meters
-    ]
+def distance_to_ring_edge(lat: float, lon: float, row: int, col: int, ring: int) -> float:
+    """
+    Get a lower bound for the distance from a point to anywhere outside the square of cells
+    that is ring cells out from the cell (row, col). Anything not yet searched is at least
+    this far away.
+
+    @param lat: The input latitude  (y)
+    @param lon: The input longitude (x)
+    @param row: The grid row the point is in
+    @param col: The grid column the point is in
+    @param ring: How many cells out from the center cell have been searched
+    @return: The distance in meters
+    """
+    meters_per_degree = math.radians(1) * EARTH_RADIUS
+
+    min_lat = (row - ring) * GRID_CELL_SIZE
+    max_lat = (row + ring + 1) * GRID_CELL_SIZE
+    min_lon = (col - ring) * GRID_CELL_SIZE
+    max_lon = (col + ring + 1) * GRID_CELL_SIZE
+
+    # longitude degrees are shortest at the furthest latitude from the equator
+    widest_lat = min(max(abs(min_lat), abs(max_lat)), 90)
+    lat_gap = min(lat - min_lat, max_lat - lat) * meters_per_degree
+    lon_gap = (min(lon - min_lon, max_lon - lon) * meters_per_degree
+               * math.cos(math.radians(widest_lat)))
 
-    return nearby_chunks
+    return min(lat_gap, lon_gap)
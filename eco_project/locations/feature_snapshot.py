@@ -0,0 +1,218 @@
+"""
+This module keeps an in-memory, array backed snapshot of every FeatureInstance so location
+aware requests don't need to query and build model objects just to read coordinates.
+Each process keeps the snapshot alongside the map data version it was built at. The signals in
+signals.py bump that shared version once a change commits, so every process rebuilds its
+snapshot lazily on its next read.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+from django.db import transaction
+
+from .chunk_handling import MAX_GRID_RINGS, distance_to_ring_edge, get_grid_cell, \
+    haversine_many
+from .map_data_version import get_map_data_version
+from .models import FeatureInstance
+
+
+class FeatureSnapshot:
+    """
+    A read only table of all the feature instances. Row i of every array is the same feature.
+    """
+
+    def __init__(self, instances: list[FeatureInstance]) -> None:
+        """
+        Build the snapshot from a list of feature instances.
+
+        @param instances: The feature instances (with their feature type loaded)
+        """
+        self.slugs = np.array([instance.slug for instance in instances], dtype=object)
+        self.names = [instance.name for instance in instances]
+        self.lats = np.array([instance.latitude for instance in instances], dtype=np.float64)
+        self.lons = np.array([instance.longitude for instance in instances], dtype=np.float64)
+        self.feature_type_ids = np.array(
+            [instance.feature_id for instance in instances], dtype=np.int64)
+        self.colours = [instance.feature.colour for instance in instances]
+        self.mesh_urls = [
+            instance.feature.feature_mesh.url if instance.feature.feature_mesh else "None"
+            for instance in instances
+        ]
+        self.index_of_slug = {slug: i for i, slug in enumerate(self.slugs)}
+
+        # the rows of the features in each spatial grid cell
+        self.grid_rows = np.array([instance.grid_row for instance in instances], dtype=np.int64)
+        self.grid_cols = np.array([instance.grid_col for instance in instances], dtype=np.int64)
+        cells: dict[tuple[int, int], list[int]] = {}
+        for i, cell in enumerate(zip(self.grid_rows.tolist(), self.grid_cols.tolist())):
+            cells.setdefault(cell, []).append(i)
+        self.cells = {cell: np.array(rows, dtype=np.int64) for cell, rows in cells.items()}
+
+    def __len__(self) -> int:
+        """
+        The number of feature instances in the snapshot.
+
+        @return: The number of feature instances.
+        """
+        return len(self.slugs)
+
+    def marker(self, index: int, include_mesh: bool = True) -> dict:
+        """
+        Get the data the 3D map needs to draw a marker for a feature.
+
+        @param index: The row of the feature in the snapshot
+        @param include_mesh: Whether to include the mesh URL
+        @return: A dictionary of the lat, lon, colour (and mesh url) of the feature
+        """
+        marker = {
+            "lat": float(self.lats[index]),
+            "lon": float(self.lons[index]),
+            "colour": self.colours[index],
+        }
+        if include_mesh:
+            marker["mesh_url"] = self.mesh_urls[index]
+        return marker
+
+    def _rows_in_ring(self, row: int, col: int, inner: int, outer: int) -> np.ndarray:
+        """
+        Get the features in the grid cells that are more than inner but at most outer cells
+        from the cell (row, col).
+
+        @param row: The grid row of the center cell
+        @param col: The grid column of the center cell
+        @param inner: The ring already searched (-1 if none has been)
+        @param outer: The ring to search out to
+        @return: The rows of the features in those cells
+        """
+        def in_ring(cell: tuple[int, int]) -> bool:
+            return inner < max(abs(cell[0] - row), abs(cell[1] - col)) <= outer
+
+        # look up each cell of the ring unless there are fewer occupied cells than that
+        if (2 * outer + 1) ** 2 <= len(self.cells):
+            cells = (
+                (cell_row, cell_col)
+                for cell_row in range(row - outer, row + outer + 1)
+                for cell_col in range(col - outer, col + outer + 1)
+            )
+            found = [self.cells[cell] for cell in cells if in_ring(cell) and cell in self.cells]
+        else:
+            found = [rows for cell, rows in self.cells.items() if in_ring(cell)]
+        return np.concatenate([np.array([], dtype=np.int64)] + found)
+
+    def nearest(self, lat: float, lon: float, count: int,
+                mask: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the closest features to a given latitude and longitude using the spatial grid.
+        Rings of grid cells around the point are searched, doubling in size each time, until the
+        closest features found are guaranteed to be closer than anything not searched yet.
+
+        @param lat: Input latitude of the point to measure from
+        @param lon: Input longitude of the point to measure from
+        @param count: The maximum number of features to return
+        @param mask: Optional boolean array, only rows that are True are searched
+        @return: A tuple of (rows in the snapshot, distances in meters) sorted by distance
+        """
+        found_rows = np.array([], dtype=np.int64)
+        found_distances = np.array([], dtype=np.float64)
+        if count <= 0:
+            return found_rows, found_distances
+
+        row, col = get_grid_cell(lat, lon)
+        ring = 0
+        previous_ring = -1
+        while True:
+            # Only search the cells that are new since the last (smaller) square, giving up on
+            # the grid and searching everything left once the square is too big
+            outer = ring if ring <= MAX_GRID_RINGS else max(
+                int(np.abs(self.grid_rows - row).max(initial=0)),
+                int(np.abs(self.grid_cols - col).max(initial=0)))
+            candidates = self._rows_in_ring(row, col, previous_ring, outer)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+
+            found_rows = np.concatenate([found_rows, candidates])
+            found_distances = np.concatenate([found_distances, haversine_many(
+                lat, lon, self.lats[candidates], self.lons[candidates])])
+
+            if ring > MAX_GRID_RINGS:
+                break
+
+            # stop once the count-th closest is closer than anything outside the searched square
+            if len(found_distances) >= count and np.partition(
+                    found_distances, count - 1)[count - 1] <= distance_to_ring_edge(
+                    lat, lon, row, col, ring):
+                break
+
+            previous_ring = ring
+            ring = ring * 2 if ring else 1
+
+        order = np.argsort(found_distances, kind="stable")[:count]
+        return found_rows[order], found_distances[order]
+
+
+# (map data version, snapshot) for this process
+_memo: Optional[tuple[int, FeatureSnapshot]] = None  # pylint: disable=invalid-name
+_memo_lock = threading.Lock()
+
+
+def _build_feature_snapshot() -> FeatureSnapshot:
+    """
+    Build a feature snapshot from the database.
+
+    @return: The feature snapshot.
+    """
+    return FeatureSnapshot(
+        list(FeatureInstance.objects.select_related("feature").order_by("slug")))
+
+
+def get_feature_snapshot() -> FeatureSnapshot:
+    """
+    Get the current feature snapshot, building it if this process doesn't have one for the
+    current map data version.
+
+    Inside a transaction the database is always read as the transaction may see (or roll back)
+    changes the other processes don't know about.
+
+    @return: The feature snapshot.
+    """
+    global _memo  # pylint: disable=global-statement
+
+    if transaction.get_connection().in_atomic_block:
+        return _build_feature_snapshot()
+
+    # read the version before loading so a change during the load causes a rebuild next time
+    version = get_map_data_version()
+    memo = _memo
+    if memo is not None and memo[0] == version:
+        return memo[1]
+
+    with _memo_lock:
+        if _memo is None or _memo[0] != version:
+            _memo = (version, _build_feature_snapshot())
+        return _memo[1]
+
+
+def _forget_feature_snapshot() -> None:
+    """
+    Throw away this process's feature snapshot.
+
+    @return: None
+    """
+    global _memo  # pylint: disable=global-statement
+
+    with _memo_lock:
+        _memo = None
+
+
+def invalidate_feature_snapshot() -> None:
+    """
+    Throw away this process's feature snapshot once the current transaction commits (or
+    straight away if there isn't one), so a read during the transaction can't keep the old data.
+    Other processes notice the change through the map data version.
+
+    @return: None
+    """
+    transaction.on_commit(_forget_feature_snapshot)
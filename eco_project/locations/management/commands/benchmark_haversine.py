@@ -0,0 +1,87 @@
+"""
+This script benchmarks the scalar haversine function against the vectorised numpy version
+on randomly generated coordinate tables around campus.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from locations.chunk_handling import haversine, haversine_many
+
+
+class Command(BaseCommand):
+    """
+    This script is used to compare the speed of the scalar and vectorised haversine functions.
+    """
+
+    help = "Benchmark the scalar haversine against the vectorised numpy haversine"
+
+    def add_arguments(self, parser) -> None:
+        """
+        Add the optional arguments for the benchmark.
+
+        @param parser: The argument parser
+        @return: None
+        """
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[10_000, 100_000],
+            help="The number of points to benchmark with")
+        parser.add_argument(
+            "--repeats", type=int, default=5,
+            help="How many times to repeat each timing (the best is reported)")
+
+    def handle(self, *args, **kwargs) -> None:
+        """
+        This function is called when the benchmark_haversine script is run.
+
+        @param args: None expected
+        @param kwargs: The sizes and repeats arguments
+        @return: None
+        """
+        rng = np.random.default_rng(0)
+        lat, lon = 50.7358, -3.5345  # the center of campus
+
+        for size in kwargs["sizes"]:
+            # random points within ~5km of campus
+            lats = lat + rng.uniform(-0.05, 0.05, size)
+            lons = lon + rng.uniform(-0.07, 0.07, size)
+            lat_list, lon_list = lats.tolist(), lons.tolist()
+
+            # bind this size's tables as defaults so each lambda times the right ones
+            scalar_time = self.best_time(
+                lambda ys=lat_list, xs=lon_list: [
+                    haversine(lat, lon, y, x) for y, x in zip(ys, xs)],
+                kwargs["repeats"])
+            vector_time = self.best_time(
+                lambda ys=lats, xs=lons: haversine_many(lat, lon, ys, xs), kwargs["repeats"])
+
+            # make sure both versions agree before reporting anything
+            scalar = np.array([haversine(lat, lon, y, x) for y, x in zip(lat_list, lon_list)])
+            max_error = float(np.max(np.abs(scalar - haversine_many(lat, lon, lats, lons))))
+
+            self.stdout.write(
+                f"{size} points: scalar {scalar_time * 1000:.2f}ms, "
+                f"vectorised {vector_time * 1000:.2f}ms "
+                f"({scalar_time / vector_time:.1f}x faster), "
+                f"max difference {max_error:.2e}m"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Finished benchmarking"))
+
+    @staticmethod
+    def best_time(func, repeats: int) -> float:
+        """
+        Time a function several times and return the fastest run.
+
+        @param func: The function to time
+        @param repeats: How many times to run it
+        @return: The fastest time in seconds
+        """
+        best = float("inf")
+        for _ in range(max(repeats, 1)):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -5,15 +5,25 @@ automates it. There must be the console_out.txt file from blender in the same di
 script and the exports folder with all the .glb files in the same directory as this script.
 """
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from random import choice
-from typing import Any
+from typing import Any, Optional
 
 from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from locations.models import Map3DChunk, LocationsAppSettings, FeatureInstance
-from locations.signals import update_tile_feature_map
+from locations.signals import (
+    invalidate_tile_grid_cache,
+    update_tile_feature_map,
+    update_min_max_pos,
+    rebuild_tile_feature_map,
+)
+from locations.tile_grid import publish_tile_grid
 
 
 def get_mesh_data_from_file() -> dict[str, dict[str, Any]]:
@@ -104,6 +114,52 @@ def get_mesh_data_from_file() -> dict[str, dict[str, Any]]:
     return data
 
 
+def copy_chunk_file(path_to_exports: str, name: str) -> Optional[str]:
+    """
+    Copy a single chunk's .glb file into the media storage.
+
+    @param path_to_exports: The folder the exported .glb files are in
+    @param name: The name of the chunk
+    @return: The path it was saved to in storage, or None if the file doesn't exist
+    """
+    file_path: str = os.path.join(path_to_exports, f"{name}.glb")
+
+    # Check if file exists
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, "rb") as f:
+        file = File(f)  # Create a Django file object
+
+        # Save it with a safe path so that unsafe error isn't raised
+        return default_storage.save(f"locations/3d_map_chunks/{name}.glb", file)
+
+
+@contextmanager
+def map_signals_disconnected():
+    """
+    Disconnect the per chunk/feature map signals for the duration of the import,
+    reconnecting them afterwards even if the import fails.
+    """
+    signals = [
+        (post_save, update_tile_feature_map, Map3DChunk),
+        (post_delete, update_tile_feature_map, Map3DChunk),
+        (post_save, update_tile_feature_map, FeatureInstance),
+        (post_delete, update_tile_feature_map, FeatureInstance),
+        (post_save, update_min_max_pos, Map3DChunk),
+        (post_delete, update_min_max_pos, Map3DChunk),
+        (post_save, invalidate_tile_grid_cache, Map3DChunk),
+        (post_delete, invalidate_tile_grid_cache, Map3DChunk),
+    ]
+    for signal, receiver, sender in signals:
+        signal.disconnect(receiver, sender=sender)
+    try:
+        yield
+    finally:
+        for signal, receiver, sender in signals:
+            signal.connect(receiver, sender=sender)
+
+
 class Command(BaseCommand):
     """
     This script is used to import 3D map chunk data into the database.
@@ -111,69 +167,96 @@ class Command(BaseCommand):
 
     help = "Import 3D map chunk data into the database"
 
+    def add_arguments(self, parser) -> None:
+        """
+        Add the optional arguments for the import.
+
+        @param parser: The argument parser
+        @return: None
+        """
+        parser.add_argument(
+            "--workers", type=int, default=8,
+            help="How many threads to copy the chunk files with")
+
+    @contextmanager
+    def timed(self, phase: str):
+        """
+        Time a phase of the import and write how long it took.
+
+        @param phase: The name of the phase
+        """
+        start = time.perf_counter()
+        yield
+        self.stdout.write(f"{phase} took {time.perf_counter() - start:.2f}s")
+
     def handle(self, *args, **kwargs) -> None:
         """
         This function is called when the import_chunks script is run.
 
         @param args:  None expected
-        @param kwargs: None expected
+        @param kwargs: The number of workers to copy files with
         @return: None
         """
+        with self.timed("Reading chunk data"):
+            chunk_dict = get_mesh_data_from_file()
 
-        post_save.disconnect(update_tile_feature_map, sender=Map3DChunk)
-        post_delete.disconnect(update_tile_feature_map, sender=Map3DChunk)
-        post_save.disconnect(update_tile_feature_map, sender=FeatureInstance)
-        post_delete.disconnect(update_tile_feature_map, sender=FeatureInstance)
-
-        chunk_dict = get_mesh_data_from_file()
-        # clear the Map3D chunks table
         path_to_exports: str = os.path.join(
             os.getcwd(), "locations/management/commands/exports/"
         )
-        Map3DChunk.objects.all().delete()
+
+        # copy all the chunk files in parallel as this is mostly waiting on the disk
+        with self.timed(f"Copying {len(chunk_dict)} chunk files"):
+            with ThreadPoolExecutor(max_workers=max(kwargs.get("workers", 8), 1)) as pool:
+                saved_paths = list(pool.map(
+                    lambda name: copy_chunk_file(path_to_exports, name), chunk_dict))
+
         # import all the chunks from the dict
         chunks = []
-        for name, data in chunk_dict.items():
-            file_path: str = os.path.join(path_to_exports, f"{name}.glb")
-
-            # Check if file exists
-            if not os.path.exists(file_path):
-                print(f"File not found: {file_path}")
+        for (name, data), safe_file_path in zip(chunk_dict.items(), saved_paths):
+            if safe_file_path is None:
+                print(f"File not found: {os.path.join(path_to_exports, f'{name}.glb')}")
                 continue
 
-            with open(file_path, "rb") as f:
-                file = File(f)  # Create a Django file object
-
-                # Save it with a safe path so that unsafe error isn't raised
-                safe_file_path = default_storage.save(
-                    f"locations/3d_map_chunks/{name}.glb", file
+            # Create Map3DChunk instance and add it to the list
+            chunks.append(
+                Map3DChunk(
+                    file_original_name=f"{name}.glb",
+                    center_lat=data["center_deg"][0],
+                    center_lon=data["center_deg"][1],
+                    bottom_left_lat=data["bottom_left_deg"][0],
+                    bottom_left_lon=data["bottom_left_deg"][1],
+                    top_right_lat=data["top_right_deg"][0],
+                    top_right_lon=data["top_right_deg"][1],
+                    bottom_left_x=data["bottom_left_blender"][0],
+                    bottom_left_y=data["bottom_left_blender"][1],
+                    bottom_left_z=data["bottom_left_blender"][2],
+                    top_right_x=data["top_right_blender"][0],
+                    top_right_y=data["top_right_blender"][1],
+                    top_right_z=data["top_right_blender"][2],
+                    file=safe_file_path,  # Attach the saved file
                 )
+            )
 
-                # Create Map3DChunk instance and add it to the list
-                chunks.append(
-                    Map3DChunk(
-                        file_original_name=f"{name}.glb",
-                        center_lat=data["center_deg"][0],
-                        center_lon=data["center_deg"][1],
-                        bottom_left_lat=data["bottom_left_deg"][0],
-                        bottom_left_lon=data["bottom_left_deg"][1],
-                        top_right_lat=data["top_right_deg"][0],
-                        top_right_lon=data["top_right_deg"][1],
-                        bottom_left_x=data["bottom_left_blender"][0],
-                        bottom_left_y=data["bottom_left_blender"][1],
-                        bottom_left_z=data["bottom_left_blender"][2],
-                        top_right_x=data["top_right_blender"][0],
-                        top_right_y=data["top_right_blender"][1],
-                        top_right_z=data["top_right_blender"][2],
-                        file=safe_file_path,  # Attach the saved file
-                    )
-                )
+        # replace the chunks in one transaction, working out the bounds and
+        # tile feature map once at the end rather than per chunk
+        with map_signals_disconnected(), transaction.atomic():
+            with self.timed("Replacing chunks in the database"):
+                Map3DChunk.objects.all().delete()
+                Map3DChunk.objects.bulk_create(chunks)
 
-        for chunk in chunks:
-            chunk.save()
+            with self.timed("Recomputing map bounds"):
+                update_min_max_pos(sender=Map3DChunk, instance=None)
+
+            with self.timed("Rebuilding the tile feature map"):
+                rebuild_tile_feature_map()
+
+        # build the tile grid once here so the server never has to
+        with self.timed("Building the tile grid"):
+            grid = publish_tile_grid()
+        self.stdout.write(f"Tile grid is {grid.rows} rows by {grid.cols} columns")
 
         self.stdout.write(
-            self.style.SUCCESS(f"Saved {len(chunk_dict)} chunks to database")
+            self.style.SUCCESS(f"Saved {len(chunks)} chunks to database")
         )
         image_path = os.path.join(
             os.getcwd(), "locations/management/commands/heightmap.png"
@@ -204,14 +287,3 @@ class Command(BaseCommand):
         settings.skip_qr_update = True
         settings.save()
         del settings.skip_qr_update
-
-        # Reconnect the signals
-        post_save.connect(update_tile_feature_map, sender=Map3DChunk)
-        post_delete.connect(update_tile_feature_map, sender=Map3DChunk)
-        post_save.connect(update_tile_feature_map, sender=FeatureInstance)
-        post_delete.connect(update_tile_feature_map, sender=FeatureInstance)
-
-        dummy_instance = (
-            Map3DChunk.objects.first()
-        )  # This is just to trigger the signal handler
-        update_tile_feature_map(sender=Map3DChunk, instance=dummy_instance)
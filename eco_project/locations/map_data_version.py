@@ -0,0 +1,77 @@
+"""
+This module lets browsers cache the map APIs. The map data only changes when an admin edits
+the map settings, tiles or features, so one version number covers all of it. The version lives
+in the shared cache and is bumped by the signals in signals.py. The map APIs send it as their
+ETag and Last-Modified, so a browser asking again with the same version gets a 304 response
+without the view querying or encoding anything.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+MAP_DATA_VERSION_KEY = "map-data-version"
+
+
+def get_map_data_version() -> int:
+    """
+    Get the current version of the map data from the shared cache.
+
+    @return: The current version, the time in nanoseconds it was last changed
+    """
+    version = cache.get(MAP_DATA_VERSION_KEY)
+    if version is None:
+        # nothing cached yet (or it was evicted) so start a new version every process agrees on
+        cache.add(MAP_DATA_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(MAP_DATA_VERSION_KEY)
+    return version
+
+
+def bump_map_data_version() -> None:
+    """
+    Mark every cached copy of the map data as out of date once the current transaction
+    commits (or straight away if there isn't one).
+
+    @return: None
+    """
+    transaction.on_commit(
+        lambda: cache.set(MAP_DATA_VERSION_KEY, time.time_ns(), timeout=None))
+
+
+# pylint: disable=unused-argument
+def _map_data_etag(request, *args, **kwargs) -> str:
+    """
+    Get the ETag of a map API response, which is the map data version.
+
+    @param request: The request object
+    @return: The ETag
+    """
+    return f"map-{get_map_data_version()}"
+
+
+def _map_data_last_modified(request, *args, **kwargs) -> datetime:
+    """
+    Get when the map data was last changed.
+
+    @param request: The request object
+    @return: The time the map data version was bumped
+    """
+    return datetime.fromtimestamp(get_map_data_version() / 1e9, tz=timezone.utc)
+
+
+def map_data_cached(view: Callable) -> Callable:
+    """
+    Decorate a map API view so browsers cache it and check it's still current on each use,
+    getting a 304 response if the map data hasn't changed.
+
+    @param view: The view, which must only depend on the map data and its query string
+    @return: The decorated view
+    """
+    return cache_control(no_cache=True)(
+        condition(etag_func=_map_data_etag, last_modified_func=_map_data_last_modified)(view))
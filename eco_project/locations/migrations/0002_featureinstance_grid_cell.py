@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+from locations.chunk_handling import get_grid_cell
+
+
+def populate_grid_cells(apps, schema_editor):
+    """
+    Work out the grid cell of every existing feature instance.
+    """
+    feature_instance_model = apps.get_model('locations', 'FeatureInstance')
+    instances = list(feature_instance_model.objects.all())
+    for instance in instances:
+        instance.grid_row, instance.grid_col = get_grid_cell(instance.latitude,
+                                                             instance.longitude)
+    feature_instance_model.objects.bulk_update(instances, ['grid_row', 'grid_col'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='featureinstance',
+            name='grid_col',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='featureinstance',
+            name='grid_row',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_grid_cells, migrations.RunPython.noop),
+    ]
@@ -5,17 +5,11 @@ and their locations.
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
-import os
-from django.conf import settings
-from django.contrib.staticfiles import finders
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.db.models import ImageField
 from django.db.models.fields.files import ImageFieldFile
-from qrcode import QRCode, constants
-from qrcode.image.styledpil import StyledPilImage
-from qrcode.image.styles.colormasks import RadialGradiantColorMask
-from qrcode.image.styles.moduledrawers.pil import RoundedModuleDrawer
+from mysite.singleton_cache import bump_singleton_version, get_cached_singleton
 from thefuzz import fuzz
 
 
@@ -74,6 +68,29 @@ class FeatureInstance(models.Model):
 
     instance_description: models.TextField = models.TextField()
 
+    # spatial grid cell, derived from latitude/longitude on every save, the feature snapshot
+    # groups features by it so nearby lookups only measure a few cells
+    grid_row = models.IntegerField(default=0, editable=False)
+    grid_col = models.IntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Overriding the save method to keep the spatial grid cell in sync with the
+        latitude and longitude.
+
+        @param args: Likely None
+        @param kwargs: Likely None
+        @return: None
+        """
+        # pylint: disable=import-outside-toplevel
+        from .chunk_handling import get_grid_cell  # avoid circular import
+
+        self.grid_row, self.grid_col = get_grid_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "grid_row", "grid_col"}
+        super().save(*args, **kwargs)
+
     @property
     def description(self) -> str:
         """
@@ -93,38 +110,10 @@ class FeatureInstance(models.Model):
 
         @param skip_signal: Whether to skip the signal that triggers this method.
         """
-        # Find the absolute path of the static image
-        logo_path = finders.find("locations/media/ecopetLogoWhiteBG.png")
-        if not logo_path:
-            raise FileNotFoundError(
-                "Static file 'locations/media/ecopetLogoWhiteBG.png' not found."
-            )
-        qr = QRCode(error_correction=constants.ERROR_CORRECT_H)
-        qr.add_data(
-            f"{LocationsAppSettings.get_instance().qr_prefix}{self.slug}")
-
-        # make the image
-        img = qr.make_image(
-            image_factory=StyledPilImage,
-            module_drawer=RoundedModuleDrawer(),
-            embeded_image_path=logo_path,  # Use the absolute path from the finder
-            color_mask=RadialGradiantColorMask(
-                center_color=(74, 107, 66), edge_color=(24, 219, 34)
-            ),
-            error_correction=constants.ERROR_CORRECT_H,
-        )
-
-        qr_code_path = os.path.join(settings.MEDIA_ROOT, "locations/qr_codes/")
-
-        # Create the directory if it doesn't exist
-        os.makedirs(qr_code_path, exist_ok=True)
-        img_path = os.path.join(qr_code_path, f"{self.slug}.png")
-        img.save(img_path)
-
-        # Update the ImageField reference without triggering signals
-        self.__class__.objects.filter(pk=self.pk).update(
-            qr_code=f"locations/qr_codes/{self.slug}.png"
-        )
+        # pylint: disable=import-outside-toplevel
+        from .qr_codes import update_qr_codes  # avoid circular import
+
+        update_qr_codes([self])
 
     @property
     def has_question(self) -> bool:
@@ -262,6 +251,7 @@ class LocationsAppSettings(models.Model):
         """
         self.pk = 1  # Ensure there's only one instance
         super().save(*args, **kwargs)
+        bump_singleton_version(LocationsAppSettings)
 
     def delete(self, *args, **kwargs) -> None:
         """
@@ -278,10 +268,12 @@ class LocationsAppSettings(models.Model):
         """
         Static method to return the instance of this model.
         If there is no instance, it will create one.
+        The instance is cached per process until the settings are next saved.
 
         @return: The singleton instance of this model.
         """
-        return cls.objects.first() or cls.objects.create()
+        return get_cached_singleton(
+            cls, lambda: cls.objects.first() or cls.objects.create())
 
     def __str__(self):
         """
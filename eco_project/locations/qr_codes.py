@@ -0,0 +1,183 @@
+"""
+This module renders the styled QR codes for FeatureInstances.
+Rendering is slow so many QR codes are rendered at once in a pool of spawned processes. QR codes are stored
+under a hash of their content and styling, so any QR code already in that cache is reused.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import hashlib
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from PIL import Image
+from qrcode import QRCode, constants
+from qrcode.image.styledpil import StyledPilImage
+from qrcode.image.styles.colormasks import RadialGradiantColorMask
+from qrcode.image.styles.moduledrawers.pil import RoundedModuleDrawer
+
+QR_CODE_DIR = "locations/qr_codes/"
+LOGO_STATIC_PATH = "locations/media/ecopetLogoWhiteBG.png"
+
+# Everything about how a QR code looks, changing any of this changes every QR code's hash
+QR_CENTER_COLOUR = (74, 107, 66)
+QR_EDGE_COLOUR = (24, 219, 34)
+QR_STYLE = f"rounded|{QR_CENTER_COLOUR}|{QR_EDGE_COLOUR}|H|{LOGO_STATIC_PATH}"
+
+# The logo is loaded once per process rather than once per QR code
+_logo_cache: dict[str, Image.Image] = {}
+
+
+def find_logo() -> str:
+    """
+    Find the absolute path of the logo that goes in the middle of the QR codes.
+
+    @return: The absolute path of the logo.
+    """
+    logo_path = finders.find(LOGO_STATIC_PATH)
+    if not logo_path:
+        raise FileNotFoundError(f"Static file '{LOGO_STATIC_PATH}' not found.")
+    return logo_path
+
+
+def load_logo(logo_path: str) -> Image.Image:
+    """
+    Load the logo image, reusing it if this process has already loaded it.
+
+    @param logo_path: The absolute path of the logo
+    @return: The logo image
+    """
+    if logo_path not in _logo_cache:
+        with Image.open(logo_path) as logo:
+            logo.load()
+            _logo_cache[logo_path] = logo.copy()
+    return _logo_cache[logo_path]
+
+
+def qr_code_path(data: str) -> str:
+    """
+    Get the media path a QR code is stored at. The path is a hash of the encoded data and
+    the styling so identical QR codes share a file and a changed QR code gets a new one.
+
+    @param data: The data encoded in the QR code
+    @return: The path relative to the media root
+    """
+    content_hash = hashlib.sha256(f"{QR_STYLE}|{data}".encode("utf-8")).hexdigest()[:32]
+    return f"{QR_CODE_DIR}{content_hash}.png"
+
+
+def render_qr_code(data: str, logo_path: str, output_path: str) -> None:
+    """
+    Render a styled QR code and save it as a PNG.
+    This runs in worker processes so must not touch the database.
+
+    @param data: The data to encode in the QR code
+    @param logo_path: The absolute path of the logo to put in the middle
+    @param output_path: The absolute path to save the PNG to
+    @return: None
+    """
+    qr = QRCode(error_correction=constants.ERROR_CORRECT_H)
+    qr.add_data(data)
+
+    # make the image
+    img = qr.make_image(
+        image_factory=StyledPilImage,
+        module_drawer=RoundedModuleDrawer(),
+        embeded_image=load_logo(logo_path),
+        color_mask=RadialGradiantColorMask(
+            center_color=QR_CENTER_COLOUR, edge_color=QR_EDGE_COLOUR
+        ),
+        error_correction=constants.ERROR_CORRECT_H,
+    )
+    img.save(output_path)
+
+
+def _render_job(job: tuple[str, str, str]) -> None:
+    """
+    Unpack a render job for the process pool.
+
+    @param job: A tuple of (data, logo path, output path)
+    @return: None
+    """
+    render_qr_code(*job)
+
+
+def update_qr_codes(instances: Optional[Iterable] = None, qr_prefix: Optional[str] = None,
+                    workers: Optional[int] = None, progress_bar: bool = False) -> int:
+    """
+    Point feature instances at their up-to-date QR codes, rendering only the ones that are not
+    already in the cache, then save all their new paths in one bulk update.
+
+    @param instances: The feature instances to update (default all of them)
+    @param qr_prefix: The QR prefix to use (default the one in the map settings)
+    @param workers: How many processes to render with (default one per CPU)
+    @param progress_bar: Whether to display a progress bar
+    @return: The number of QR codes rendered
+    """
+    # pylint: disable=import-outside-toplevel
+    from .models import FeatureInstance, LocationsAppSettings  # avoid circular import
+
+    if instances is None:
+        instances = FeatureInstance.objects.all()
+    if qr_prefix is None:
+        qr_prefix = LocationsAppSettings.get_instance().qr_prefix
+    logo_path = find_logo()
+
+    # Work out which QR codes are out of date and which of those need rendering
+    changed = []
+    jobs = []
+    for instance in instances:
+        data = f"{qr_prefix}{instance.slug}"
+        path = qr_code_path(data)
+        full_path = os.path.join(settings.MEDIA_ROOT, path)
+        cached = os.path.exists(full_path)
+        if instance.qr_code.name == path and cached:
+            continue  # already up to date
+
+        instance.qr_code = path
+        changed.append(instance)
+        if not cached:
+            jobs.append((data, logo_path, full_path))
+
+    # Create the directory if it doesn't exist
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, QR_CODE_DIR), exist_ok=True)
+
+    if len(jobs) > 1 and workers != 1:
+        # spawn rather than fork, this can run in a web server thread holding locks and
+        # database connections a forked child would inherit
+        with ProcessPoolExecutor(max_workers=workers, initializer=load_logo,
+                                 initargs=(logo_path,),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            for ind, _ in enumerate(pool.map(_render_job, jobs, chunksize=4)):
+                if progress_bar:
+                    _draw_progress(ind + 1, len(jobs))
+    else:
+        for ind, job in enumerate(jobs):
+            _render_job(job)
+            if progress_bar:
+                _draw_progress(ind + 1, len(jobs))
+    if progress_bar:
+        sys.stdout.write('\r\n')
+        sys.stdout.flush()
+
+    # Update the ImageField references without triggering signals
+    FeatureInstance.objects.bulk_update(changed, ["qr_code"], batch_size=500)
+
+    return len(jobs)
+
+
+def _draw_progress(done: int, total: int) -> None:
+    """
+    Draw a progress bar to the console.
+
+    @param done: How many QR codes have been rendered
+    @param total: How many QR codes there are to render
+    @return: None
+    """
+    per = int(20 * done / total)  # how many # to draw
+    sys.stdout.write(f'\r[{"#" * per}{" " * (20 - per)}] {done}/{total}')
+    sys.stdout.flush()
@@ -6,15 +6,20 @@ LocationsAppSettings singleton instance whenever a Map3DChunk instance is saved
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
-import sys
+from django.db import transaction
 from django.db.models import Min, Max
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 
+from .feature_snapshot import invalidate_feature_snapshot
+from .map_data_version import bump_map_data_version
+from .qr_codes import update_qr_codes
+from .tile_grid import invalidate_tile_grid
 from .models import (
     LocationsAppSettings,
     FeatureInstance,
     FeatureInstanceTileMap,
+    FeatureType,
     Map3DChunk,
 )
 
@@ -41,23 +46,60 @@ def update_feature_instance_qr_code(sender, instance, progress_bar=False, **kwar
         instance.skip_qr_update = True
         instance.update_qr_code(skip_signal=True)
         instance.skip_qr_update = False
-    else:
-        for ind, feature_instance in enumerate(FeatureInstance.objects.all()):
-            # print(f'created QR code for feature instance {feature_instance}')
+    elif getattr(instance, "qr_prefix_changed", True):
+        # render every out-of-date QR code in parallel with the settings read once
+        update_qr_codes(qr_prefix=instance.qr_prefix, progress_bar=progress_bar)
+
+
+@receiver(pre_save, sender=LocationsAppSettings)
+def check_qr_prefix_changed(sender, instance, **kwargs) -> None:
+    """
+    Record whether the QR prefix is being changed by this save, so the QR codes are
+    only regenerated when the URL they encode actually changes.
+    """
+    if hasattr(instance, "skip_qr_update") and instance.skip_qr_update:
+        return
+    previous_prefix = LocationsAppSettings.objects.filter(pk=1).values_list(
+        "qr_prefix", flat=True).first()
+    instance.qr_prefix_changed = previous_prefix != instance.qr_prefix
+
+
+@receiver(post_save, sender=FeatureInstance)
+@receiver(post_delete, sender=FeatureInstance)
+@receiver(post_save, sender=FeatureType)
+@receiver(post_delete, sender=FeatureType)
+def invalidate_feature_snapshot_cache(sender, instance, **kwargs) -> None:
+    """
+    When a FeatureInstance or FeatureType is changed or deleted the in-memory feature
+    snapshot is out of date, so throw it away to be rebuilt on the next read.
+    """
+    invalidate_feature_snapshot()
+
+
+@receiver(post_save, sender=FeatureInstance)
+@receiver(post_delete, sender=FeatureInstance)
+@receiver(post_save, sender=FeatureType)
+@receiver(post_delete, sender=FeatureType)
+@receiver(post_save, sender=Map3DChunk)
+@receiver(post_delete, sender=Map3DChunk)
+@receiver(post_save, sender=LocationsAppSettings)
+def invalidate_map_data_cache(sender, instance, **kwargs) -> None:
+    """
+    When the map settings, a Map3DChunk, a FeatureInstance or a FeatureType is changed or
+    deleted, the map APIs' responses are out of date, so bump the map data version for
+    browsers to fetch them again.
+    """
+    bump_map_data_version()
 
-            feature_instance.skip_qr_update = True
-            feature_instance.update_qr_code(skip_signal=True)
-            feature_instance.skip_qr_update = False
 
-            length = FeatureInstance.objects.all().count()
-            per = int(20 * (1 + ind) / length)  # how many # to draw
-            if progress_bar:
-                sys.stdout.write(  # draw a progress bar
-                    f'\r[{"#" * per}{" " * (20 - per)}] {(1 + ind)}/{length}')
-                sys.stdout.flush()
-        if progress_bar:
-            sys.stdout.write('\r\n')
-            sys.stdout.flush()
+@receiver(post_save, sender=Map3DChunk)
+@receiver(post_delete, sender=Map3DChunk)
+def invalidate_tile_grid_cache(sender, instance, **kwargs) -> None:
+    """
+    When a Map3DChunk is changed or deleted every process's tile grid is out of date,
+    so bump its version for it to be rebuilt on the next read.
+    """
+    invalidate_tile_grid()
 
 
 @receiver(post_save, sender=Map3DChunk)
@@ -118,24 +160,68 @@ def update_min_max_pos(sender, instance, **kwargs) -> None:
 def update_tile_feature_map(sender, instance, **kwargs) -> None:
     """
     When a FeatureInstance or Map3DChunk is changed or deleted,
-    clear and rebuild the tile feature map.
+    update the tile feature map for just that feature or chunk.
 
     This map shows which features reside in which map chunks.
     """
-    # clear the existing tile feature map.
-    FeatureInstanceTileMap.objects.all().delete()
-
-    for feature in FeatureInstance.objects.all():
-        # use filter not loop for speed. Check it is inside chunk geodesic
-        # bounds
-        matching_chunks = Map3DChunk.objects.filter(
-            bottom_left_lat__lte=feature.latitude,
-            top_right_lat__gte=feature.latitude,
-            bottom_left_lon__lte=feature.longitude,
-            top_right_lon__gte=feature.longitude,
-        )
+    # Deleting a feature or chunk cascades to its mappings so there is nothing to do
+    if kwargs.get("signal") is post_delete:
+        return
 
-        for chunk in matching_chunks:  # add all matching pairs to the mapping
-            FeatureInstanceTileMap.objects.create(
-                feature_instance=feature, map_chunk=chunk
+    # Saves that don't touch the position or bounds can't change the mapping
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not {
+            "latitude", "longitude", "bottom_left_lat", "top_right_lat",
+            "bottom_left_lon", "top_right_lon"} & set(update_fields):
+        return
+
+    with transaction.atomic():
+        if sender == FeatureInstance:
+            # the feature may have moved so recompute only its mappings
+            FeatureInstanceTileMap.objects.filter(feature_instance=instance).delete()
+            matching_chunks = Map3DChunk.objects.filter(
+                bottom_left_lat__lte=instance.latitude,
+                top_right_lat__gte=instance.latitude,
+                bottom_left_lon__lte=instance.longitude,
+                top_right_lon__gte=instance.longitude,
+            ).values_list("id", flat=True)
+            FeatureInstanceTileMap.objects.bulk_create(
+                FeatureInstanceTileMap(feature_instance=instance, map_chunk_id=chunk_id)
+                for chunk_id in matching_chunks
+            )
+        else:
+            # the chunk may have changed bounds so only touch features inside it
+            FeatureInstanceTileMap.objects.filter(map_chunk=instance).delete()
+            matching_features = FeatureInstance.objects.filter(
+                latitude__gte=instance.bottom_left_lat,
+                latitude__lte=instance.top_right_lat,
+                longitude__gte=instance.bottom_left_lon,
+                longitude__lte=instance.top_right_lon,
+            ).values_list("slug", flat=True)
+            FeatureInstanceTileMap.objects.bulk_create(
+                FeatureInstanceTileMap(feature_instance_id=slug, map_chunk=instance)
+                for slug in matching_features
             )
+
+
+def rebuild_tile_feature_map() -> None:
+    """
+    Clear and rebuild the whole tile feature map in one transaction.
+    Used after bulk imports where the signals were disconnected.
+
+    @return: None
+    """
+    chunks = list(Map3DChunk.objects.values_list(
+        "id", "bottom_left_lat", "top_right_lat", "bottom_left_lon", "top_right_lon"))
+    features = list(FeatureInstance.objects.values_list("slug", "latitude", "longitude"))
+
+    mappings = [
+        FeatureInstanceTileMap(feature_instance_id=slug, map_chunk_id=chunk_id)
+        for slug, lat, lon in features
+        for chunk_id, min_lat, max_lat, min_lon, max_lon in chunks
+        if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+    ]
+
+    with transaction.atomic():
+        FeatureInstanceTileMap.objects.all().delete()
+        FeatureInstanceTileMap.objects.bulk_create(mappings)
@@ -199,28 +199,30 @@ export class UniversityMap {
     /* Chunk creation / deletion methods */
 
     /**
-     * Retrieves an array of nearby tile file names from the API for a given location.
+     * Asks the API which tiles are in range of a location, which of them still need loading,
+     * which loaded tiles should be unloaded, and the features on the tiles to load, all in one
+     * request.
      *
      * @param {number} lat - Latitude
      * @param {number} lon - Longitude
      * @param {number} [radius=this.render_dist] - Search radius (default is this.render_dist).
-     * @return {Promise<Array>} Promise resolving to an array of tile file names.
+     * @return {Promise<Object>} Promise resolving to the viewport (tiles, load, unload, features).
      */
-    async getNearbyTiles(lat, lon, radius = this.render_dist) {
+    async getViewport(lat, lon, radius = this.render_dist) {
         if (!lat || !lon || isNaN(lat) || isNaN(lon)) {
-            return []; // Coords aren't loaded yet
+            return {tiles: [], load: [], unload: [], features: {}}; // Coords aren't loaded yet
         }
-        // Send API request to server to get nearby tiles.
-        const response = await fetch(`/locations/api/nearby-tiles/?lat=${lat}&lon=${lon}&distance=${radius}`);
-        const data = await response.json();
+        // Tell the server which tiles are already loaded so it only sends what has changed.
+        const loadedIds = Object.keys(this.loadedTiles).map(name => this.nameToId[name]);
+        const response = await fetch(`/locations/api/viewport/?lat=${lat}&lon=${lon}` +
+            `&distance=${radius}&loaded=${loadedIds.join(",")}`);
+        const viewport = await response.json();
 
-        const nearbyTileNames = []; // add them to the name-id map and return list of names
-        for (const tile of data) {
-            nearbyTileNames.push(tile['file']);
+        for (const tile of viewport.tiles) {
             // Create a name-to-id table.
             this.nameToId[tile['file']] = tile['id'];
         }
-        return nearbyTileNames;
+        return viewport;
     }
 
     /**
@@ -229,17 +231,18 @@ export class UniversityMap {
      * @param {number} lat - Latitude.
      * @param {number} lon - Longitude.
      * @param {number} [radius=this.render_dist] - Search radius (default is this.render_dist).
+     * @return {Promise<Object>} Promise resolving to the viewport the tiles were loaded from.
      */
     async _loadNearbyTiles(lat, lon, radius = this.render_dist) {
-        // Retrieve the list of nearby tile names.
-        const tileNames = await this.getNearbyTiles(lat, lon, this.render_dist);
-
-        // Get the feature instances for the given tiles.
-        let features_at_tiles = await this._getFeatureInstancesForTiles(tileNames);
+        // Find out which tiles to load and the features on them.
+        const viewport = await this.getViewport(lat, lon, radius);
+        const toLoad = new Set(viewport.load);
+        const features_at_tiles = viewport.features;
 
         // Load each tile that hasn't already been loaded.
-        for (const name of tileNames) {
-            if (!this.loadedTiles[name]) {
+        for (const tile of viewport.tiles) {
+            const name = tile['file'];
+            if (toLoad.has(tile['id']) && !this.loadedTiles[name]) {
                 try {
                     // Load (maybe from cache) the GLTF asset.
                     const gltf = await this.gltfLoader.loadGLTF(name);
@@ -251,41 +254,36 @@ export class UniversityMap {
                     this.loadedTiles[name] = mesh;
 
                     // Load in feature markers for this tile
-                    if (features_at_tiles) {
-                        if (features_at_tiles[name]) {
-                            for (const feature of features_at_tiles[name]) {
-                                const lat = feature['lat'];
-                                const lon = feature['lon'];
-                                const colour = feature['colour'];
-                                const mesh_url = feature['mesh_url'];
-                                await this.createMarker(lat, lon, colour, mesh, mesh_url);
-                            }
-                        } else { // error check if tile isnt in features table
-                            console.error("Tile name not found in features at tiles table:", name);
+                    if (features_at_tiles[name]) {
+                        for (const feature of features_at_tiles[name]) {
+                            const lat = feature['lat'];
+                            const lon = feature['lon'];
+                            const colour = feature['colour'];
+                            const mesh_url = feature['mesh_url'];
+                            await this.createMarker(lat, lon, colour, mesh, mesh_url);
                         }
-                    } else { // error check if no features table
-                        console.error("No features at tiles table found");
+                    } else { // error check if tile isnt in features table
+                        console.error("Tile name not found in features at tiles table:", name);
                     }
                 } catch (error) { // handle any other tile errors nicely
                     console.error("Error loading tile:", name, error);
                 }
             }
         }
+        return viewport;
     }
 
     /**
-     * Unloads 3D tiles that aren't nearby for the specified location.
+     * Unloads the given 3D tiles, ie the ones the viewport said aren't nearby any more.
      *
-     * @param {number} lat - Latitude.
-     * @param {number} lon - Longitude.
-     * @param {number} [radius=this.render_dist] - Valid area radius (default is this.render_dist).
+     * @param {Array<number>} unloadIds - The ids of the tiles to unload.
      */
-    async _unloadTiles(lat, lon, radius = this.render_dist) {
-        const validTileNames = await this.getNearbyTiles(lat, lon, radius);
+    _unloadTiles(unloadIds) {
+        const toUnload = new Set(unloadIds);
 
         // Remove any tiles that aren't nearby
         for (const name in this.loadedTiles) {
-            if (!validTileNames.includes(name)) {
+            if (toUnload.has(this.nameToId[name])) {
                 const tile = this.loadedTiles[name];
 
                 // Remove markers attached to this tile from activeMarkers
@@ -315,16 +313,14 @@ export class UniversityMap {
 
 
     /**
-     * Wait until all expected tiles for a given location are loaded or until a timeout.
+     * Wait until all the tiles in a viewport are loaded or until a timeout.
      *
-     * @param {number} lat - Latitude.
-     * @param {number} lon - Longitude.
-     * @param {number} [radius=this.render_dist] - Search radius (default this.render_dist)
+     * @param {Object} viewport - The viewport whose tiles should be loaded.
      * @param {number} [timeout=5000] - Timeout time (default 5000ms)
      */
-    async _waitForTiles(lat, lon, radius = this.render_dist, timeout = 5000) {
+    async _waitForTiles(viewport, timeout = 5000) {
         const startTime = performance.now();
-        const expectedTiles = await this.getNearbyTiles(lat, lon, radius);
+        const expectedTiles = viewport.tiles.map(tile => tile['file']);
 
         // Wait until all tiles are loaded or timed out
         while (true) {
@@ -407,37 +403,6 @@ export class UniversityMap {
     }
 
 
-    /**
-     * This function takes in a list of tiles and retrieves the feature instances that are within
-     * all of said tiles
-     *
-     * @param tiles The list of tiles to retrieve feature instances for
-     * @return {Promise<void>} A promise that resolves when the feature instances have been retrieved
-     * (Also returns the response).
-     * @private
-     */
-    async _getFeatureInstancesForTiles(tiles) {
-        // Make a list of tile ids from the tiles list which is comprised of names.
-        const tileIds = [];
-        for (const tile of tiles) {
-            if (tile in this.nameToId) {
-                tileIds.push(this.nameToId[tile]);
-            } else {
-                console.error("Tile name not found in name to id table:", tile);
-            }
-        }
-
-        if (tileIds.length === 0) {
-            return; // No need to make a request if there are no tile ids.
-        }
-
-        // Actually make and return request.
-        const response = await fetch(`/locations/api/get_features_for_tile/?tiles=${tileIds}`);
-        const data = await response.json();
-
-        return data;
-    }
-
     /* Location calculation methods */
     /**
      * Converts lat and lon coordinates to an [x, y] position
@@ -523,12 +488,13 @@ export class UniversityMap {
             const intermediateLat = oldLat + (i / steps) * (newLat - oldLat);
             const intermediateLon = oldLon + (i / steps) * (newLon - oldLon);
             // load and wait for intermediate tiles
-            await this._loadNearbyTiles(intermediateLat, intermediateLon, this.render_dist);
-            await this._waitForTiles(intermediateLat, intermediateLon, this.render_dist);
+            const viewport = await this._loadNearbyTiles(intermediateLat, intermediateLon,
+                this.render_dist);
+            await this._waitForTiles(viewport);
         }
         // load and wait for final lat/lon tiles
-        await this._loadNearbyTiles(newLat, newLon, this.render_dist);
-        await this._waitForTiles(newLat, newLon, this.render_dist);
+        const viewport = await this._loadNearbyTiles(newLat, newLon, this.render_dist);
+        await this._waitForTiles(viewport);
 
         // Convert the new geographic coordinates to scene coordinates.
         const [newX, newY] = this._latLonToXY(newLat, newLon);
@@ -544,7 +510,7 @@ export class UniversityMap {
         this.lat = newLat;
         this.lng = newLon;
 
-        await this._unloadTiles(newLat, newLon); // Unload tiles that aren't near anymore
+        this._unloadTiles(viewport.unload); // Unload tiles that aren't near anymore
     }
 
     /* Camera and rendering methods */
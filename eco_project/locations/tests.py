@@ -3,12 +3,21 @@ This module contains the test suite for the locations app.
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, RequestFactory
+from django.test import TestCase, RequestFactory, TransactionTestCase
 from django.urls import reverse
 
 from challenges.models import ChallengeSettings
+from mysite.singleton_cache import clear_singleton_cache
+from .chunk_handling import get_grid_cell, haversine, haversine_many
+from .feature_snapshot import get_feature_snapshot, invalidate_feature_snapshot
+from .map_data_version import bump_map_data_version, get_map_data_version
+from .qr_codes import qr_code_path, update_qr_codes
+from .signals import rebuild_tile_feature_map
+from .tile_grid import clear_tile_grid_cache, get_nearby_tiles, get_tile_grid
 from .models import FeatureInstance, FeatureType, QuestionAnswer, QuestionFeature, Map3DChunk, \
     LocationsAppSettings, FeatureInstanceTileMap
 
@@ -221,6 +230,58 @@ class SignalsTests(TestCase):
         chunk.save()
         self.assertEqual(FeatureInstanceTileMap.objects.count(), 1)
 
+    def test_update_tile_feature_map_is_incremental(self) -> None:
+        """
+        Test that saving a feature only recomputes that feature's mappings and
+        saving a chunk only recomputes that chunk's mappings.
+
+        @return: None
+        """
+        chunk = Map3DChunk.objects.create(
+            bottom_left_lat=-1.0, top_right_lat=2.0, bottom_left_lon=-1.0, top_right_lon=2.0)
+        other_chunk = Map3DChunk.objects.create(
+            bottom_left_lat=-2.0, top_right_lat=1.0, bottom_left_lon=-2.0, top_right_lon=1.0)
+        other_feature = FeatureInstance.objects.create(
+            slug="other-feature", name="Other", latitude=1.5, longitude=1.5,
+            feature=self.feature_type)
+        other_mapping = FeatureInstanceTileMap.objects.get(feature_instance=other_feature)
+        self.assertEqual(other_mapping.map_chunk, chunk)
+        self.assertEqual(FeatureInstanceTileMap.objects.count(), 3)
+
+        # moving a feature out of one chunk leaves the other feature's mapping untouched
+        self.feature_instance.latitude = 1.5
+        self.feature_instance.save()
+        self.assertTrue(FeatureInstanceTileMap.objects.filter(pk=other_mapping.pk).exists())
+        self.assertEqual(
+            list(FeatureInstanceTileMap.objects.filter(
+                feature_instance=self.feature_instance).values_list("map_chunk", flat=True)),
+            [chunk.id])
+
+        # shrinking a chunk only touches that chunk's mappings
+        other_chunk.top_right_lat = 1.6
+        other_chunk.top_right_lon = 1.6
+        other_chunk.save(update_fields=["top_right_lat", "top_right_lon"])
+        self.assertTrue(FeatureInstanceTileMap.objects.filter(pk=other_mapping.pk).exists())
+        self.assertEqual(FeatureInstanceTileMap.objects.filter(map_chunk=other_chunk).count(), 2)
+
+    def test_rebuild_tile_feature_map(self) -> None:
+        """
+        Test that rebuilding the tile feature map matches the incremental updates.
+
+        @return: None
+        """
+        Map3DChunk.objects.create(
+            bottom_left_lat=-1.0, top_right_lat=2.0, bottom_left_lon=-1.0, top_right_lon=2.0)
+        Map3DChunk.objects.create(
+            bottom_left_lat=1.0, top_right_lat=2.0, bottom_left_lon=1.0, top_right_lon=2.0)
+        expected = set(FeatureInstanceTileMap.objects.values_list(
+            "feature_instance", "map_chunk"))
+
+        FeatureInstanceTileMap.objects.all().delete()
+        rebuild_tile_feature_map()
+        self.assertEqual(set(FeatureInstanceTileMap.objects.values_list(
+            "feature_instance", "map_chunk")), expected)
+
     def test_update_feature_instance_qr_code_post_save(self) -> None:
         """
         Test the update feature instance qr code post save signal
@@ -236,6 +297,55 @@ class SignalsTests(TestCase):
         self.feature_instance.save()
         self.assertEqual(FeatureInstanceTileMap.objects.count(), 0)
 
+    def test_update_qr_codes_skips_unchanged(self) -> None:
+        """
+        Test that changing the QR prefix re-renders every QR code in one go
+        and that up-to-date QR codes are skipped.
+
+        @return: None
+        """
+        FeatureInstance.objects.create(
+            slug="other-feature", name="Other", latitude=1.5, longitude=1.5,
+            feature=self.feature_type)
+        self.assertEqual(update_qr_codes(), 0)
+
+        settings = LocationsAppSettings.get_instance()
+        settings.qr_prefix = "https://example.com/locations/reached/"
+        settings.save()
+
+        for instance in FeatureInstance.objects.all():
+            self.assertEqual(instance.qr_code.name, qr_code_path(
+                f"https://example.com/locations/reached/{instance.slug}"))
+            self.assertTrue(instance.qr_code.storage.exists(instance.qr_code.name))
+        self.assertEqual(update_qr_codes(), 0)
+
+    def test_qr_codes_only_regenerated_on_prefix_change(self) -> None:
+        """
+        Test that saving the map settings only touches the QR codes when the prefix changes,
+        and that switching back to an old prefix reuses the cached images.
+
+        @return: None
+        """
+        settings = LocationsAppSettings.get_instance()
+        old_path = FeatureInstance.objects.get(pk=self.feature_instance.pk).qr_code.name
+
+        with patch("locations.signals.update_qr_codes") as mock_update:
+            settings.world_colour = "#123456"
+            settings.render_dist = 100
+            settings.save()
+            mock_update.assert_not_called()
+
+            settings.qr_prefix = "https://example.com/"
+            settings.save()
+            mock_update.assert_called_once()
+
+        update_qr_codes(qr_prefix="https://example.com/")
+        with patch("locations.qr_codes.render_qr_code") as mock_render:
+            self.assertEqual(update_qr_codes(qr_prefix="", workers=1), 0)
+            mock_render.assert_not_called()
+        self.assertEqual(
+            FeatureInstance.objects.get(pk=self.feature_instance.pk).qr_code.name, old_path)
+
 
 class ModelsTests(TestCase):
     """
@@ -407,3 +517,446 @@ class ModelsTests(TestCase):
 
         )
         self.assertEqual(str(answer), "Test answer")
+
+
+class ChunkHandlingTests(TestCase):
+    """
+    Test suite for the geodesic helpers in chunk_handling.
+    Ensures that the spatial grid is kept up to date and that nearest feature lookups return
+    the same features as checking every feature would.
+    """
+
+    coords = [(50.7358 + 0.004 * i, -3.5345 - 0.003 * (i % 5)) for i in range(15)]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """
+        Create a feature type and a spread of feature instances around campus once for
+        the whole suite as saving a feature instance renders its QR code.
+
+        @return: None
+        """
+        feature_type = FeatureType.objects.create(
+            name="Test Feature Type",
+            colour="#ffffff",
+        )
+        for i, (lat, lon) in enumerate(cls.coords):
+            FeatureInstance.objects.create(
+                slug=f"feature-{i}",
+                name=f"Feature {i}",
+                latitude=lat,
+                longitude=lon,
+                feature=feature_type,
+            )
+
+    def test_grid_cell_updated_on_save(self) -> None:
+        """
+        Test that moving a feature instance moves it to a new grid cell.
+
+        @return: None
+        """
+        instance = FeatureInstance.objects.get(slug="feature-0")
+        self.assertEqual((instance.grid_row, instance.grid_col),
+                         get_grid_cell(instance.latitude, instance.longitude))
+
+        instance.latitude = 51.0
+        instance.save(update_fields=["latitude"])
+        instance.refresh_from_db()
+        self.assertEqual((instance.grid_row, instance.grid_col), get_grid_cell(51.0, -3.5345))
+
+    def test_nearest_features_matches_brute_force(self) -> None:
+        """
+        Test that the grid search returns the closest features in distance order.
+
+        @return: None
+        """
+        lat, lon = 50.7401, -3.5362
+        expected = sorted(
+            (haversine(lat, lon, f_lat, f_lon), f"feature-{i}")
+            for i, (f_lat, f_lon) in enumerate(self.coords)
+        )[:5]
+
+        snapshot = get_feature_snapshot()
+        rows, distances = snapshot.nearest(lat, lon, 5)
+        self.assertEqual(snapshot.slugs[rows].tolist(), [slug for _, slug in expected])
+        for dist, (expected_dist, _) in zip(distances, expected):
+            self.assertAlmostEqual(dist, expected_dist, places=6)
+
+    def test_haversine_many_matches_scalar(self) -> None:
+        """
+        Test that the vectorised haversine gives the same distances as the scalar one.
+
+        @return: None
+        """
+        lats = [lat for lat, _ in self.coords]
+        lons = [lon for _, lon in self.coords]
+        distances = haversine_many(50.7401, -3.5362, lats, lons)
+        for dist, (lat, lon) in zip(distances, self.coords):
+            self.assertAlmostEqual(dist, haversine(50.7401, -3.5362, lat, lon), places=6)
+
+    def test_nearest_features_far_away(self) -> None:
+        """
+        Test that features outside the grid search radius are still found.
+
+        @return: None
+        """
+        rows, _ = get_feature_snapshot().nearest(0.0, 0.0, 3)
+        self.assertEqual(len(rows), 3)
+
+    def test_nearest_features_mask(self) -> None:
+        """
+        Test that features left out of the mask are skipped.
+
+        @return: None
+        """
+        snapshot = get_feature_snapshot()
+        rows, _ = snapshot.nearest(50.7358, -3.5345, 20, snapshot.slugs != "feature-0")
+        slugs = snapshot.slugs[rows].tolist()
+        self.assertEqual(len(slugs), 14)
+        self.assertNotIn("feature-0", slugs)
+
+
+class FeatureSnapshotTests(TransactionTestCase):
+    """
+    Test suite for the in-memory feature snapshot.
+    Ensures that the snapshot matches the database and is rebuilt after the signals fire.
+    These run outside a transaction as the snapshot is skipped inside one.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create a feature type and a feature instance, starting from an empty snapshot.
+
+        @return: None
+        """
+        invalidate_feature_snapshot()
+        self.feature_type = FeatureType.objects.create(
+            name="Test Feature Type",
+            colour="#ffffff",
+        )
+        self.feature_instance = FeatureInstance.objects.create(
+            slug="test-feature-instance",
+            name="Test Feature Instance",
+            latitude=1.0,
+            longitude=2.0,
+            feature=self.feature_type,
+        )
+
+    def test_snapshot_contents(self) -> None:
+        """
+        Test that the snapshot holds the feature instance data.
+
+        @return: None
+        """
+        snapshot = get_feature_snapshot()
+        self.assertEqual(len(snapshot), 1)
+        self.assertEqual(snapshot.marker(0), {
+            "lat": 1.0, "lon": 2.0, "colour": "#ffffff", "mesh_url": "None"})
+        self.assertEqual(snapshot.index_of_slug["test-feature-instance"], 0)
+
+    def test_snapshot_reused_until_invalidated(self) -> None:
+        """
+        Test that the snapshot is only rebuilt after a feature changes.
+
+        @return: None
+        """
+        snapshot = get_feature_snapshot()
+        with self.assertNumQueries(0):
+            self.assertIs(get_feature_snapshot(), snapshot)
+
+        self.feature_instance.latitude = 3.0
+        self.feature_instance.save()
+        self.assertEqual(get_feature_snapshot().lats.tolist(), [3.0])
+
+        self.feature_type.colour = "#000000"
+        self.feature_type.save()
+        self.assertEqual(get_feature_snapshot().colours, ["#000000"])
+
+        self.feature_instance.delete()
+        self.assertEqual(len(get_feature_snapshot()), 0)
+
+    def test_snapshot_rebuilt_after_change_in_other_process(self) -> None:
+        """
+        Test that a change made elsewhere (no signal in this process) is picked up once the
+        shared map data version is bumped.
+
+        @return: None
+        """
+        get_feature_snapshot()
+        FeatureInstance.objects.update(latitude=5.0)  # like another worker's edit
+        self.assertEqual(get_feature_snapshot().lats.tolist(), [1.0])
+
+        bump_map_data_version()
+        self.assertEqual(get_feature_snapshot().lats.tolist(), [5.0])
+
+    def test_get_feature_instances_api(self) -> None:
+        """
+        Test that the feature instances API is served from the snapshot.
+
+        @return: None
+        """
+        get_feature_snapshot()
+        response = self.client.get(reverse("locations:get-feature-instances"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"lat": 1.0, "lon": 2.0, "colour": "#ffffff"}])
+
+
+class SettingsCacheTests(TransactionTestCase):
+    """
+    Test suite for the cached map settings singleton.
+    These run outside a transaction as the cache is skipped inside one.
+    """
+
+    def setUp(self) -> None:
+        """
+        Start each test with an empty settings cache and some map settings.
+
+        @return: None
+        """
+        clear_singleton_cache()
+        settings = LocationsAppSettings.get_instance()
+        settings.camera_z_map = "locations/camera_z_map/test.png"
+        settings.render_dist = 300
+        settings.save()
+
+    def tearDown(self) -> None:
+        """
+        Forget the cached settings as the database is emptied after each test.
+
+        @return: None
+        """
+        clear_singleton_cache()
+
+    def test_map_data_reads_settings_from_cache(self) -> None:
+        """
+        Test that the map data API does at most one settings read, and none once cached.
+
+        @return: None
+        """
+        clear_singleton_cache()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("locations:map-data"))
+        self.assertEqual(response.json()[0]["render_dist"], 300)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("locations:map-data"))
+            self.client.get(reverse("locations:get-location"))
+
+    def test_saving_settings_invalidates_cache(self) -> None:
+        """
+        Test that saving the settings is picked up by the next read.
+
+        @return: None
+        """
+        self.assertEqual(LocationsAppSettings.get_instance().render_dist, 300)
+
+        settings = LocationsAppSettings.get_instance()
+        settings.render_dist = 123
+        settings.save()
+
+        response = self.client.get(reverse("locations:map-data"))
+        self.assertEqual(response.json()[0]["render_dist"], 123)
+
+    def test_cached_copy_is_safe_to_modify(self) -> None:
+        """
+        Test that changing a returned settings object without saving doesn't leak into the cache.
+
+        @return: None
+        """
+        LocationsAppSettings.get_instance().render_dist = 5
+        self.assertEqual(LocationsAppSettings.get_instance().render_dist, 300)
+
+
+def create_tile_grid(rows: int, cols: int) -> list[Map3DChunk]:
+    """
+    Create a slightly skewed grid of 100m map chunks around campus, like the Blender export.
+
+    @param rows: The number of rows of chunks
+    @param cols: The number of columns of chunks
+    @return: The chunks
+    """
+    height, width = 0.0009, 0.0014
+    chunks = []
+    for row in range(rows):
+        for col in range(cols):
+            lat = 50.73 + row * height - col * 0.00002
+            lon = -3.54 + col * width + row * 0.00003
+            chunks.append(Map3DChunk.objects.create(
+                file=f"locations/3d_map_chunks/{row}_{col}.glb",
+                file_original_name=f"{row}_{col}.glb",
+                center_lat=lat, center_lon=lon,
+                bottom_left_lat=lat - height / 2, top_right_lat=lat + height / 2,
+                bottom_left_lon=lon - width / 2, top_right_lon=lon + width / 2,
+            ))
+    return chunks
+
+
+class TileGridTests(TestCase):
+    """
+    Test suite for the grid used to find nearby map tiles.
+    """
+
+    def test_nearby_tiles_match_brute_force(self) -> None:
+        """
+        Test that the grid finds exactly the tiles whose centers are in range.
+
+        @return: None
+        """
+        chunks = create_tile_grid(6, 5)
+        for lat, lon, distance in [(50.7322, -3.5345, 250), (50.7322, -3.5345, 0),
+                                   (50.725, -3.545, 400), (50.7, -3.5, 100),
+                                   (50.731, -3.537, 10000)]:
+            expected = [chunk.id for chunk in chunks if haversine(
+                lat, lon, chunk.center_lat, chunk.center_lon) <= distance]
+            self.assertEqual([tile["id"] for tile in get_nearby_tiles(lat, lon, distance)],
+                             expected)
+
+    def test_nearby_tiles_api(self) -> None:
+        """
+        Test that the nearby tiles API returns each tile's id, file, lat and lon.
+
+        @return: None
+        """
+        chunk = create_tile_grid(1, 1)[0]
+        response = self.client.get(reverse("locations:nearby-tiles"),
+                                   {"lat": chunk.center_lat, "lon": chunk.center_lon})
+        self.assertEqual(response.json(), [{
+            "id": chunk.id, "file": chunk.file.url,
+            "lat": chunk.center_lat, "lon": chunk.center_lon}])
+
+        response = self.client.get(reverse("locations:nearby-tiles"), {"lat": "x"})
+        self.assertEqual(response.status_code, 400)
+
+        # searches that can't be turned into grid cells are rejected rather than erroring
+        for bad in [{"distance": "inf"}, {"distance": "-1"}, {"lat": "nan"}, {"lon": "inf"},
+                    {"lat": "89.9999999999", "distance": "1e300"}]:
+            for url in [reverse("locations:nearby-tiles"), reverse("locations:viewport")]:
+                response = self.client.get(url, {"lat": chunk.center_lat,
+                                                 "lon": chunk.center_lon, **bad})
+                self.assertEqual(response.status_code, 400, (url, bad))
+
+    def test_viewport_api(self) -> None:
+        """
+        Test that the viewport API sends only the tiles to load, their features and the
+        loaded tiles to unload.
+
+        @return: None
+        """
+        near, far = create_tile_grid(1, 2)
+        feature_type = FeatureType.objects.create(name="Bin", colour="#ffffff")
+        FeatureInstance.objects.create(name="Bin", slug="bin", feature=feature_type,
+                                       latitude=near.center_lat, longitude=near.center_lon)
+        url = reverse("locations:viewport")
+        params = {"lat": near.center_lat, "lon": near.center_lon, "distance": 50}
+
+        response = self.client.get(url, params).json()
+        self.assertEqual([tile["id"] for tile in response["tiles"]], [near.id])
+        self.assertEqual((response["load"], response["unload"]), ([near.id], []))
+        self.assertEqual(response["features"], {near.file.url: [{
+            "lat": near.center_lat, "lon": near.center_lon,
+            "colour": "#ffffff", "mesh_url": "None"}]})
+
+        # only the tile that has gone out of range is sent back, with nothing to load
+        response = self.client.get(url, {**params, "loaded": f"{near.id},{far.id}"}).json()
+        self.assertEqual((response["load"], response["unload"]), ([], [far.id]))
+        self.assertEqual(response["features"], {})
+
+        response = self.client.get(url, {**params, "loaded": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_features_for_tiles_query_count(self) -> None:
+        """
+        Test that the features for tiles API uses the same number of queries however many
+        tiles and features are asked for.
+
+        @return: None
+        """
+        chunks = create_tile_grid(4, 5)
+        feature_type = FeatureType.objects.create(name="Bin", colour="#ffffff")
+        for chunk in chunks:
+            FeatureInstance.objects.create(
+                name="Bin", slug=f"bin-{chunk.id}", feature=feature_type,
+                latitude=chunk.center_lat, longitude=chunk.center_lon)
+        url = reverse("locations:get-feature-for-tiles")
+
+        # the tile grid and feature snapshot (not cached inside a test transaction) and one
+        # mapping query
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"tiles": str(chunks[0].id)})
+        self.assertEqual(len(response.json()[chunks[0].file.url]), 1)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"tiles": ",".join(str(chunk.id) for chunk in chunks)})
+        self.assertEqual(list(response.json()), [chunk.file.url for chunk in chunks])
+        self.assertTrue(all(len(markers) >= 1 for markers in response.json().values()))
+
+
+class TileGridCacheTests(TransactionTestCase):
+    """
+    Test suite for sharing the tile grid between requests.
+    These run outside a transaction as the cache is skipped inside one.
+    """
+
+    def setUp(self) -> None:
+        """
+        Start each test with no cached tile grid.
+
+        @return: None
+        """
+        clear_tile_grid_cache()
+
+    def tearDown(self) -> None:
+        """
+        Forget the tile grid as the database is emptied after each test.
+
+        @return: None
+        """
+        clear_tile_grid_cache()
+
+    def test_tile_grid_reused_until_chunks_change(self) -> None:
+        """
+        Test that nearby tiles don't query the database until a chunk changes.
+
+        @return: None
+        """
+        chunk = create_tile_grid(2, 2)[0]
+        grid = get_tile_grid()
+        with self.assertNumQueries(0):
+            self.assertIs(get_tile_grid(), grid)
+            self.assertEqual(len(get_nearby_tiles(50.73, -3.54, 200)), 4)
+
+        chunk.delete()
+        self.assertEqual(len(get_nearby_tiles(50.73, -3.54, 200)), 3)
+
+
+class MapDataCacheTests(TransactionTestCase):
+    """
+    Test suite for the conditional (ETag) caching of the map APIs.
+    These run outside a transaction as the version is only bumped once changes are committed.
+    """
+
+    def test_unchanged_map_data_is_not_modified(self) -> None:
+        """
+        Test that asking again with the ETag gets a 304 response without any queries,
+        until the map data changes.
+
+        @return: None
+        """
+        url = reverse("locations:get-feature-instances")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        version = get_map_data_version()
+        FeatureType.objects.create(name="Bin", colour="#ffffff")
+        self.assertNotEqual(get_map_data_version(), version)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
@@ -0,0 +1,270 @@
+"""
+This module finds nearby 3D map tiles without querying the database.
+The Blender export cuts the map into a regular grid of tiles, so a grid descriptor
+(origin, cell size and a rows x columns table of tiles) is built once, when the map is imported,
+and shared through the cache. Nearby tiles are then found with integer arithmetic on the
+table, checking only the few cells the search radius covers.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import math
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .chunk_handling import haversine_many
+from .models import Map3DChunk
+
+# The version of the tile grid lives in the shared cache so every process sees new imports
+TILE_GRID_VERSION_KEY = "tile-grid-version"
+TILE_GRID_TIMEOUT = 60 * 60 * 24  # rebuild from the database at least once a day
+
+# (version, grid) for this process
+_memo: Optional[tuple[int, "TileGrid"]] = None  # pylint: disable=invalid-name
+_memo_lock = threading.Lock()
+
+
+class TileGrid:  # pylint: disable=too-many-instance-attributes
+    """
+    A read only grid of all the 3D map tiles. Row i of every array is the same tile, ordered by id.
+    Each tile is put in the grid cell its center is in. The export's tiles are slightly skewed
+    so a cell can hold no tiles or a few, but never ones far from it.
+    """
+
+    def __init__(self, chunks: list[tuple[int, str, float, float, float, float]]) -> None:
+        """
+        Build the grid from the tiles' ids, file URLs, centers and sizes.
+
+        @param chunks: A list of (id, file url, center lat, center lon, height in degrees,
+         width in degrees) tuples
+        """
+        chunks = sorted(chunks)
+        self.ids = np.array([chunk[0] for chunk in chunks], dtype=np.int64)
+        self.files = [chunk[1] for chunk in chunks]
+        self.lats = np.array([chunk[2] for chunk in chunks], dtype=np.float64)
+        self.lons = np.array([chunk[3] for chunk in chunks], dtype=np.float64)
+        self.index_of_id = {chunk[0]: i for i, chunk in enumerate(chunks)}
+
+        # the cells are the size of a typical tile, starting at the lowest tile center
+        self.origin_lat = float(self.lats.min()) if chunks else 0.0
+        self.origin_lon = float(self.lons.min()) if chunks else 0.0
+        self.cell_lat = _cell_size([chunk[4] for chunk in chunks])
+        self.cell_lon = _cell_size([chunk[5] for chunk in chunks])
+
+        rows = ((self.lats - self.origin_lat) // self.cell_lat).astype(np.int64)
+        cols = ((self.lons - self.origin_lon) // self.cell_lon).astype(np.int64)
+        self.rows = int(rows.max(initial=-1)) + 1
+        self.cols = int(cols.max(initial=-1)) + 1
+
+        # the tiles sorted by cell, cell c holds cell_tiles[cell_starts[c]:cell_starts[c + 1]]
+        cells = rows * self.cols + cols
+        self.cell_tiles = np.argsort(cells, kind="stable")
+        self.cell_starts = np.searchsorted(
+            cells[self.cell_tiles], np.arange(self.rows * self.cols + 1))
+
+    def __len__(self) -> int:
+        """
+        The number of tiles in the grid.
+
+        @return: The number of tiles.
+        """
+        return len(self.ids)
+
+    def tile(self, index: int) -> dict:
+        """
+        Get the data the 3D map needs to load a tile.
+
+        @param index: The row of the tile in the grid's arrays
+        @return: A dictionary of the id, file url, lat and lon of the tile
+        """
+        return {
+            "id": int(self.ids[index]),
+            "file": self.files[index],
+            "lat": float(self.lats[index]),
+            "lon": float(self.lons[index]),
+        }
+
+    @staticmethod
+    def _cell_range(low: float, high: float, origin: float, size: float,
+                    count: int) -> range:
+        """
+        Get the rows (or columns) of the cells between two latitudes (or longitudes).
+
+        @param low: The lowest latitude (or longitude) of the search box
+        @param high: The highest latitude (or longitude) of the search box
+        @param origin: The latitude (or longitude) the grid starts at
+        @param size: The cell height (or width)
+        @param count: The number of rows (or columns)
+        @return: The range of rows (or columns)
+        """
+        first = max(math.floor((low - origin) / size), 0)
+        last = min(math.floor((high - origin) / size), count - 1)
+        return range(first, last + 1)
+
+    def nearby(self, lat: float, lon: float, max_distance_meters: float) -> np.ndarray:
+        """
+        Find the tiles whose centers are within a distance of a latitude and longitude.
+
+        @param lat: The input latitude  (y)
+        @param lon: The input longitude (x)
+        @param max_distance_meters: The maximum distance in meters to the tile centers
+        @return: The rows of the nearby tiles in the grid's arrays, in id order
+        """
+        # the bounding box the centers must be in, 1 degree is roughly 111.32 km
+        lat_offset = max_distance_meters / 111320
+        lon_offset = max_distance_meters / (111320 * math.cos(math.radians(lat)))
+
+        cols = self._cell_range(lon - lon_offset, lon + lon_offset,
+                                self.origin_lon, self.cell_lon, self.cols)
+        if not cols:
+            return np.array([], dtype=np.int64)
+
+        # the cells of a row are next to each other so each row is one slice
+        candidates = np.sort(np.concatenate([np.array([], dtype=np.int64)] + [
+            self.cell_tiles[self.cell_starts[row * self.cols + cols.start]:
+                            self.cell_starts[row * self.cols + cols.stop]]
+            for row in self._cell_range(lat - lat_offset, lat + lat_offset,
+                                        self.origin_lat, self.cell_lat, self.rows)
+        ]))
+
+        distances = haversine_many(lat, lon, self.lats[candidates], self.lons[candidates])
+        return candidates[distances <= max_distance_meters]
+
+
+def _cell_size(sizes: list[float]) -> float:
+    """
+    Work out how big the grid cells should be from the sizes of the tiles.
+
+    @param sizes: The tile heights (or widths) in degrees
+    @return: The typical tile size, or 1 degree if there are no usable tiles
+    """
+    size = float(np.median(sizes)) if sizes else 0.0
+    return size if size > 0 else 1.0
+
+
+def build_tile_grid() -> TileGrid:
+    """
+    Build the tile grid from the 3D map chunks in the database.
+
+    @return: The tile grid.
+    """
+    storage = Map3DChunk._meta.get_field("file").storage  # pylint: disable=protected-access
+    chunks = Map3DChunk.objects.values_list(
+        "id", "file", "center_lat", "center_lon",
+        "bottom_left_lat", "bottom_left_lon", "top_right_lat", "top_right_lon")
+    return TileGrid([
+        (chunk_id, storage.url(file), center_lat, center_lon,
+         top_right_lat - bottom_left_lat, top_right_lon - bottom_left_lon)
+        for chunk_id, file, center_lat, center_lon,
+        bottom_left_lat, bottom_left_lon, top_right_lat, top_right_lon in chunks
+    ])
+
+
+def _grid_key(version: int) -> str:
+    """
+    Get the cache key that holds the tile grid at a version.
+
+    @param version: The tile grid version
+    @return: The cache key
+    """
+    return f"tile-grid:{version}"
+
+
+def get_tile_grid_version() -> int:
+    """
+    Get the current version of the tile grid from the shared cache.
+
+    @return: The current version
+    """
+    version = cache.get(TILE_GRID_VERSION_KEY)
+    if version is None:
+        # nothing cached yet (or it was evicted) so start a new version every process agrees on
+        cache.add(TILE_GRID_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(TILE_GRID_VERSION_KEY)
+    return version
+
+
+def get_tile_grid() -> TileGrid:
+    """
+    Get the current tile grid, from this process if it has the current version, otherwise from
+    the shared cache, only building it from the database if neither has it.
+
+    Inside a transaction the database is always read as the transaction may see (or roll back)
+    tile changes the cache doesn't know about.
+
+    @return: The tile grid.
+    """
+    global _memo  # pylint: disable=global-statement
+
+    if transaction.get_connection().in_atomic_block:
+        return build_tile_grid()
+
+    # read the version before loading so a change during the load causes a reload next time
+    version = get_tile_grid_version()
+    memo = _memo
+    if memo is not None and memo[0] == version:
+        return memo[1]
+
+    grid = cache.get(_grid_key(version))
+    if grid is None:
+        grid = build_tile_grid()
+        cache.set(_grid_key(version), grid, timeout=TILE_GRID_TIMEOUT)
+    with _memo_lock:
+        _memo = (version, grid)
+    return grid
+
+
+def publish_tile_grid() -> TileGrid:
+    """
+    Build the tile grid and share it as the new current version, so no process has to build it.
+    Used after the map is imported.
+
+    @return: The tile grid.
+    """
+    grid = build_tile_grid()
+    version = time.time_ns()
+    cache.set(_grid_key(version), grid, timeout=TILE_GRID_TIMEOUT)
+    cache.set(TILE_GRID_VERSION_KEY, version, timeout=None)
+    return grid
+
+
+def invalidate_tile_grid() -> None:
+    """
+    Mark every process's tile grid as out of date once the current transaction commits
+    (or straight away if there isn't one).
+
+    @return: None
+    """
+    transaction.on_commit(
+        lambda: cache.set(TILE_GRID_VERSION_KEY, time.time_ns(), timeout=None))
+
+
+def clear_tile_grid_cache() -> None:
+    """
+    Forget this process's tile grid and the shared version.
+
+    @return: None
+    """
+    global _memo  # pylint: disable=global-statement
+
+    with _memo_lock:
+        _memo = None
+    cache.delete(TILE_GRID_VERSION_KEY)
+
+
+def get_nearby_tiles(lat: float, lon: float, max_distance_meters: float = 100) -> list[dict]:
+    """
+    Get all 3D map chunks within a certain distance of a given latitude and longitude.
+
+    @param lat: The input latitude  (y)
+    @param lon: The input longitude (x)
+    @param max_distance_meters: The maximum distance in meters to search for
+     nearby tiles (default 100)
+    @return: The list of nearby tiles' id, file url, lat and lon
+    """
+    grid = get_tile_grid()
+    return [grid.tile(index) for index in grid.nearby(lat, lon, max_distance_meters)]
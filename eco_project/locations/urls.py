@@ -15,6 +15,7 @@ urlpatterns = [
     path("reached/<slug:slug>", views.individual_feature_page, name="individual-feature"),
     path("education/<int:id_arg>", views.generic_feature_page, name="generic-feature"),
     path("api/nearby-tiles/", api.nearby_tiles, name="nearby-tiles"),
+    path("api/viewport/", api.map_viewport, name="viewport"),
     path("api/map_data/", api.api_get_map_data, name="map-data"),
     path("api/get_location/", api.get_current_location, name="get-location"),
     path("api/get_feature_instances/", api.get_feature_instances, name="get-feature-instances", ),
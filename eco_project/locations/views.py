@@ -7,6 +7,7 @@ from challenges.challenge_helpers import user_reached_feature, user_in_range_of_
     get_features_near
 from django.http import HttpResponse
 from django.shortcuts import render
+from users.location_updates import get_profile_location
 from .models import FeatureInstance, FeatureType, QuestionFeature, LocationsAppSettings
 
 
@@ -71,11 +72,11 @@ def generic_feature_page(request, id_arg) -> HttpResponse:
     # Get nearby feature instances of this type to display on the page
 
     # get user location if logged in else get default locations
-    lat = LocationsAppSettings.get_instance().default_lat
-    lon = LocationsAppSettings.get_instance().default_lon
+    map_settings = LocationsAppSettings.get_instance()
+    lat = map_settings.default_lat
+    lon = map_settings.default_lon
     if request.user.is_authenticated:
-        lat = request.user.profile.latitude
-        lon = request.user.profile.longitude
+        lat, lon = get_profile_location(request.user.profile)
 
     nearby_feature_instances = list(get_features_near(lat, lon, specific_feature=feature_type))
 
@@ -2,6 +2,8 @@
 ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django, and the location WebSocket goes to users.location_stream.
+runserver can't serve WebSockets so run this with an ASGI server such as uvicorn.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -9,9 +11,40 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 # pylint: disable=E5110:
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+if settings.DEBUG:
+    # serve the static files from the apps like runserver does, for running under uvicorn
+    django_application = ASGIStaticFilesHandler(django_application)
+
+# pylint: disable=wrong-import-position
+# Django has to be set up before anything that uses the models is imported
+from users.location_stream import location_stream
+
+LOCATION_STREAM_PATH = "/ws/location/"
+
+
+async def application(scope, receive, send) -> None:
+    """
+    Send WebSocket connections to the location stream and everything else to Django.
+
+    @param scope: The ASGI connection scope
+    @param receive: The ASGI receive channel
+    @param send: The ASGI send channel
+    @return: None
+    """
+    if scope["type"] == "websocket":
+        if scope["path"] == LOCATION_STREAM_PATH:
+            await location_stream(scope, receive, send)
+        else:
+            await receive()  # the connect message
+            await send({"type": "websocket.close"})
+        return
+
+    await django_application(scope, receive, send)
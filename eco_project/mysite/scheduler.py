@@ -1,9 +0,0 @@
-"""
-This sets up the scheduler for the challenges
-
-@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
-"""
-from apscheduler.schedulers.background import BackgroundScheduler
-
-# Global scheduler instance
-scheduler = BackgroundScheduler()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "leaderboard.apps.LeaderboardConfig",
     "stories.apps.StoriesConfig",
+    "jobs.apps.JobsConfig",
 ]
 
 MIDDLEWARE = [
@@ -85,6 +87,27 @@ DATABASES = {
 
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The settings and map data caches keep their versions here so it must be shared by every
+# process. The file based cache is for development, use Redis or Memcached when deploying
+# with more than one process.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    }
+}
+
+# The tests get their own in-memory cache so they don't share state with a running server
+if "test" in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -138,3 +161,10 @@ LOGIN_REDIRECT_URL = "/pets/mypet/"
 
 CHECK_USER_CHALLENGE_RANGE = True
 USER_CHALLENGE_RANGE = 500
+
+# Locations closer than this (in meters) to the last stored one aren't written
+LOCATION_UPDATE_MIN_DISTANCE = 5
+# If above 0, locations are buffered and written in bulk every this many seconds
+LOCATION_FLUSH_INTERVAL = 0
+# How often (in seconds) the location stream looks up the nearby challenges again
+LOCATION_CHALLENGE_REFRESH_INTERVAL = 30
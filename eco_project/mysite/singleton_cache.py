@@ -0,0 +1,99 @@
+"""
+This module is a process-wide cache for the singleton settings models
+(LocationsAppSettings and ChallengeSettings) which are read on almost every request.
+
+Each process keeps its own copy of each singleton alongside the version it was loaded at.
+The version lives in the shared Django cache and is bumped whenever the singleton is saved,
+so every worker process notices the change on its next read.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import copy
+import threading
+import time
+from typing import Callable, TypeVar
+
+from django.core.cache import cache
+from django.db import models, transaction
+
+ModelT = TypeVar("ModelT", bound=models.Model)
+
+# model label -> (version, instance) for this process
+_memo: dict[str, tuple[int, models.Model]] = {}
+_memo_lock = threading.Lock()
+
+
+def _version_key(model: type[models.Model]) -> str:
+    """
+    Get the cache key that holds the version of a singleton model.
+
+    @param model: The singleton model class
+    @return: The cache key
+    """
+    return f"singleton-version:{model._meta.label_lower}"
+
+
+def get_singleton_version(model: type[models.Model]) -> int:
+    """
+    Get the current version of a singleton model from the shared cache.
+
+    @param model: The singleton model class
+    @return: The current version
+    """
+    key = _version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # nothing cached yet (or it was evicted) so start a new version every process agrees on
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_singleton_version(model: type[models.Model]) -> None:
+    """
+    Mark every process's cached copy of a singleton as out of date once the current
+    transaction commits (or straight away if there isn't one).
+
+    @param model: The singleton model class
+    @return: None
+    """
+    transaction.on_commit(
+        lambda: cache.set(_version_key(model), time.time_ns(), timeout=None))
+
+
+def get_cached_singleton(model: type[ModelT], loader: Callable[[], ModelT]) -> ModelT:
+    """
+    Get a singleton model instance, only loading it from the database if this process
+    doesn't have a copy of the current version.
+
+    Inside a transaction the database is always read as the transaction may see (or roll back)
+    changes the cache doesn't know about.
+
+    @param model: The singleton model class
+    @param loader: A function that loads the singleton from the database
+    @return: A copy of the singleton instance that is safe to modify
+    """
+    if transaction.get_connection().in_atomic_block:
+        return loader()
+
+    # read the version before loading so a save during the load causes a reload next time
+    version = get_singleton_version(model)
+    label = model._meta.label_lower
+    cached = _memo.get(label)
+    if cached is None or cached[0] != version:
+        instance = loader()
+        with _memo_lock:
+            _memo[label] = (version, instance)
+        return copy.copy(instance)
+
+    return copy.copy(cached[1])
+
+
+def clear_singleton_cache() -> None:
+    """
+    Forget this process's cached singletons.
+
+    @return: None
+    """
+    with _memo_lock:
+        _memo.clear()
@@ -26,6 +26,7 @@ urlpatterns = [
     path("stories/", include("stories.urls")),
     path("", views.homepage, name="homepage"),
     path("leaderboard/", include("leaderboard.urls")),
+    path("jobs/", include("jobs.urls")),
     path("about/", views.about, name="about"),
     path("contact/", views.contact, name="contact"),
     path("faq/", views.faq, name="faq"),
@@ -90,6 +90,8 @@ class Pet(models.Model):
     health = models.IntegerField(default=100,
                                  validators=[MinValueValidator(0), MaxValueValidator(100)])
     created_at = models.DateTimeField(default=timezone.now)
+    # when the pet's health last decayed, moved on by one day per decay
+    health_decayed_at = models.DateTimeField(default=timezone.now)
     cosmetics = models.ManyToManyField(Cosmetic, blank=True)
     owner = models.ForeignKey(
         User,
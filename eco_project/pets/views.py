@@ -118,7 +118,7 @@ def buy_cosmetic(request, cosmetic_id: int):
 
     profile.pet_bucks -= cosmetic.price
     profile.owned_accessories.add(cosmetic)
-    profile.save()
+    profile.save(update_fields=["pet_bucks"])
 
     messages.success(request, f"You have successfully purchased {cosmetic.name}.")
     return redirect('pets:shop')
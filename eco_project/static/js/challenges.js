@@ -82,4 +82,11 @@ document.addEventListener('DOMContentLoaded', function () {
     document.addEventListener("locationUpdated", function (e) {
         fetchChallenges(); // Re-fetch challenges to update distances
     });
+
+// The location stream sends the challenges itself so there is nothing to fetch
+    document.addEventListener("nearbyChallenges", function (e) {
+        alertsContainer.innerHTML = '';
+        challengeQueue = e.detail || [];
+        displayAlerts();
+    });
 });
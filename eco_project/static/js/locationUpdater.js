@@ -3,6 +3,44 @@ import {getCookie} from "./cookieFetcher.js";
 let lastSentTime = 0; // Timestamp of last update
 let lastKnownPosition = null; // Stores last known location
 let locationTrackingStarted = false;
+let locationSocket = null; // The location stream, if the server supports it
+let locationStreamFailed = false; // Fall back to POSTing locations if the stream can't be used
+
+/**
+ * Open the location stream. Nearby challenges sent back over it are dispatched as a
+ * "nearbyChallenges" event. If the stream can't be opened locations are POSTed instead.
+ */
+function openLocationStream() {
+    if (!window.WebSocket || locationStreamFailed || typeof locationStreamURL === 'undefined') return;
+
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(protocol + '//' + window.location.host + locationStreamURL);
+    let opened = false;
+
+    socket.addEventListener('open', () => {
+        opened = true;
+        locationSocket = socket;
+        if (lastKnownPosition) {
+            sendLocation(lastKnownPosition.coords.latitude, lastKnownPosition.coords.longitude);
+        }
+    });
+    socket.addEventListener('message', event => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'challenges') {
+            document.dispatchEvent(new CustomEvent("nearbyChallenges", {detail: data.challenges}));
+        } else if (data.type === 'error') {
+            console.error('Location stream error:', data.error);
+        }
+    });
+    socket.addEventListener('close', () => {
+        locationSocket = null;
+        if (opened) {
+            setTimeout(openLocationStream, 5000); // reconnect after a dropped connection
+        } else {
+            locationStreamFailed = true; // e.g. not served over ASGI or not signed in
+        }
+    });
+}
 
 /**
  * Send the user's location to the API
@@ -12,6 +50,12 @@ let locationTrackingStarted = false;
 function sendLocation(lat, lon) {
     const currentTime = Date.now();
 
+    if (locationSocket) {  // the server skips positions that barely moved
+        locationSocket.send(JSON.stringify({lat: lat, lon: lon}));
+        lastSentTime = currentTime;
+        return;
+    }
+
     if (currentTime - lastSentTime >= 30* 1000) {  // Ensure updates every 30 seconds
         const absoluteLocURL = window.location.origin + updateLocURL;
 
@@ -47,6 +91,7 @@ function startLocationTracking() {
 
     if (navigator.geolocation) {
         console.log("Starting geolocation tracking");
+        openLocationStream();
 
         // Use watchPosition for realtime tracking that doesn't require polling
         navigator.geolocation.watchPosition(
@@ -5,12 +5,12 @@ from django.utils import timezone
 from .models import UserPhoto
 
 
-def remove_expired_photos() -> None:
+def remove_expired_photos() -> int:
     """
     Deletes expired UserPhoto objects and removes the corresponding image files
     from the media folder.
 
-    @return: None
+    @return: The number of photos removed
     """
     now = timezone.now()
     expired_photos = UserPhoto.objects.filter(expiration_date__lte=now)
@@ -20,3 +20,5 @@ def remove_expired_photos() -> None:
             photo.photo.delete(save=False)
 
         photo.delete()  # Delete the database record
+
+    return len(expired_photos)
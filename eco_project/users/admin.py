@@ -3,12 +3,13 @@ This file deals with displaying user app related models in the admin panel.
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 from .forms import BadgeAdminForm, UserGroupForm
-from .models import Profile, Badge, BadgeInstance, UserGroup
+from .models import Profile, Badge, BadgeInstance, UserGroup, PointsLedgerEntry
+from .points import award_points
 
 User = get_user_model()
 
@@ -31,6 +32,7 @@ class ProfileInline(admin.StackedInline):
     can_delete = False
     extra = 0
     max_num = 1
+    readonly_fields = ("points",)  # points are changed through the points ledger
 
     def has_add_permission(self, request, obj):
         """
@@ -146,9 +148,61 @@ class UserGroupAdmin(admin.ModelAdmin):
     form = UserGroupForm
 
 
+class PointsLedgerEntryAdmin(admin.ModelAdmin):
+    """
+    Admin for the points ledger. Entries can be added as manual adjustments but never edited.
+    """
+
+    model = PointsLedgerEntry
+    list_display = ("created_at", "user", "amount", "reason")
+    list_filter = ("reason",)
+    search_fields = ["user__username"]
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        """
+        The ledger is append-only so entries can't be changed.
+
+        @param request: The request object.
+        @param obj: The object being edited.
+        @return: False
+        """
+        return False
+
+    def has_delete_permission(self, request, obj=None) -> bool:
+        """
+        The ledger is append-only so entries can't be deleted.
+
+        @param request: The request object.
+        @param obj: The object being deleted.
+        @return: False
+        """
+        return False
+
+    def save_model(self, request, obj, form, change) -> None:
+        """
+        Apply a new entry to the user's points as well as recording it.
+        Points can't go below 0 so a larger deduction is reduced to the user's balance.
+
+        @param request: The request object.
+        @param obj: The ledger entry being added.
+        @param form: The admin form.
+        @param change: Whether this is a change (always False).
+        @return: None
+        """
+        awarded = award_points(obj.user, obj.amount, obj.reason)
+        if awarded != obj.amount:
+            self.message_user(
+                request,
+                f"{obj.user} only had {-awarded} points, so {-awarded} were taken away "
+                f"instead of {-obj.amount}.",
+                messages.WARNING,
+            )
+
+
 # Register Badge admin.
 admin.site.register(Badge, BadgeAdmin)
 admin.site.register(UserGroup, UserGroupAdmin)
+admin.site.register(PointsLedgerEntry, PointsLedgerEntryAdmin)
 
 # Replace the default User admin with our custom admin.
 admin.site.unregister(User)
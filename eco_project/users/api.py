@@ -11,6 +11,7 @@ from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_POST
 
+from .location_updates import record_location
 from .models import UserGroup
 
 User = get_user_model()
@@ -47,13 +48,10 @@ def update_location(request) -> JsonResponse:
             "profile"):  # if the user does not have a profile
         return JsonResponse({"error": "User profile not found."}, status=400)
 
-    # actually set the data
-    profile = request.user.profile
-    profile.latitude = lat
-    profile.longitude = lon
-    profile.save()
+    # actually set the data, unless the user has barely moved
+    stored = record_location(request.user.profile, lat, lon)
 
-    return JsonResponse({"status": "success"})
+    return JsonResponse({"status": "success", "stored": stored})
 
 
 @login_required
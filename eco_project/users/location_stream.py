@@ -0,0 +1,213 @@
+"""
+This module is a WebSocket endpoint for streaming a user's location.
+The browser opens one connection per page and sends its position over it, and gets the nearby
+challenges back whenever they change. The challenges are also looked up again every
+LOCATION_CHALLENGE_REFRESH_INTERVAL seconds, as reaching a feature or a new challenge window
+changes them without the user moving. The session and user are only loaded when the
+connection opens rather than on every location update.
+
+Messages from the client are JSON objects of the form {"lat": 50.7, "lon": -3.5}.
+Messages to the client are {"type": "challenges", "challenges": [...]} or
+{"type": "error", "error": "..."}.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http.request import validate_host
+
+from challenges.challenge_helpers import get_features_near
+
+from .location_updates import get_profile_location, record_location
+from .models import Profile
+
+# Close codes sent when the connection can't be used
+CLOSE_FORBIDDEN = 4403
+
+
+def _database_sync(func):
+    """
+    Wrap a function that uses the database so it can be awaited from the WebSocket, closing
+    stale connections around it the same way Django does around a request.
+
+    @param func: The function to wrap
+    @return: An async version of the function
+    """
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=True)
+
+
+def _header(scope: dict, name: bytes) -> Optional[str]:
+    """
+    Get a header from an ASGI scope.
+
+    @param scope: The ASGI connection scope
+    @param name: The lowercase header name
+    @return: The header value, or None if it isn't there
+    """
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin1")
+    return None
+
+
+def _origin_allowed(scope: dict) -> bool:
+    """
+    Check the connection came from a page on this site, as browsers don't apply CSRF or
+    same-origin protections to WebSockets.
+
+    @param scope: The ASGI connection scope
+    @return: True if the origin is allowed
+    """
+    origin = _header(scope, b"origin")
+    if origin is None:
+        return True  # not from a browser
+    hostname = urlparse(origin).hostname
+    return hostname is not None and validate_host(hostname, settings.ALLOWED_HOSTS)
+
+
+@_database_sync
+def _load_profile(scope: dict) -> Optional[Profile]:
+    """
+    Load the profile of the user whose session cookie opened the connection.
+
+    @param scope: The ASGI connection scope
+    @return: The user's profile, or None if they aren't signed in
+    """
+    cookies = SimpleCookie(_header(scope, b"cookie") or "")
+    session_cookie = cookies.get(settings.SESSION_COOKIE_NAME)
+    if session_cookie is None:
+        return None
+
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(session_cookie.value)
+    user = get_user(SimpleNamespace(session=session))  # only needs the session
+    if not user.is_authenticated:
+        return None
+    return Profile.objects.select_related("user").filter(user=user).first()
+
+
+@_database_sync
+def _find_challenges(profile: Profile) -> list:
+    """
+    Get the challenges near a user's latest location.
+
+    @param profile: The user's profile
+    @return: The nearby challenges
+    """
+    lat, lon = get_profile_location(profile)
+    return get_features_near(lat, lon, profile.user)
+
+
+@_database_sync
+def _update_location(profile: Profile, lat: float, lon: float,
+                     always_find_challenges: bool = False) -> Optional[list]:
+    """
+    Store a new location and, if it was stored, get the challenges near it.
+
+    @param profile: The user's profile
+    @param lat: The new latitude
+    @param lon: The new longitude
+    @param always_find_challenges: Get the challenges even if the location wasn't stored
+    @return: The nearby challenges, or None if they weren't looked up
+    """
+    if not record_location(profile, lat, lon) and not always_find_challenges:
+        return None
+
+    lat, lon = get_profile_location(profile)
+    return get_features_near(lat, lon, profile.user)
+
+
+def _parse_location(text: Optional[str]) -> tuple[float, float]:
+    """
+    Read the latitude and longitude out of a message from the client.
+
+    @param text: The message text
+    @return: A tuple of (latitude, longitude)
+    @raise ValueError: If the message isn't a valid location
+    """
+    try:
+        data = json.loads(text or "")
+        return float(data["lat"]), float(data["lon"])
+    except (TypeError, KeyError, json.JSONDecodeError) as error:
+        raise ValueError("Invalid location") from error
+
+
+async def location_stream(scope: dict, receive, send) -> None:  # pylint: disable=too-many-branches
+    """
+    The ASGI application for the location WebSocket.
+
+    @param scope: The ASGI connection scope
+    @param receive: The ASGI receive channel
+    @param send: The ASGI send channel
+    @return: None
+    """
+    if (await receive())["type"] != "websocket.connect":
+        return
+
+    profile = await _load_profile(scope) if _origin_allowed(scope) else None
+    if profile is None:
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+    await send({"type": "websocket.accept"})
+
+    loop = asyncio.get_running_loop()
+    last_challenges = None
+    next_refresh = loop.time()
+    # the receive is kept across refreshes so no message is lost by cancelling it
+    receiving = None
+    try:
+        while True:
+            if receiving is None:
+                receiving = asyncio.ensure_future(receive())
+            # wait for the first location before looking anything up
+            timeout = None if last_challenges is None else max(next_refresh - loop.time(), 0)
+            done, _ = await asyncio.wait({receiving}, timeout=timeout)
+
+            if not done:
+                challenges = await _find_challenges(profile)
+            else:
+                message = receiving.result()
+                receiving = None
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message["type"] != "websocket.receive":
+                    continue
+
+                try:
+                    lat, lon = _parse_location(message.get("text"))
+                except ValueError as error:
+                    await send({"type": "websocket.send",
+                                "text": json.dumps({"type": "error", "error": str(error)})})
+                    continue
+
+                challenges = await _update_location(
+                    profile, lat, lon, always_find_challenges=loop.time() >= next_refresh)
+
+            if challenges is None:
+                continue
+            next_refresh = loop.time() + settings.LOCATION_CHALLENGE_REFRESH_INTERVAL
+            if challenges != last_challenges:
+                # only send the challenges when they change
+                await send({"type": "websocket.send",
+                            "text": json.dumps({"type": "challenges", "challenges": challenges})})
+                last_challenges = challenges
+    finally:
+        if receiving is not None:
+            receiving.cancel()
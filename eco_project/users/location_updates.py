@@ -0,0 +1,130 @@
+"""
+This module is the ingestion path for the locations the browser sends every few seconds.
+Positions that barely moved aren't written at all, and the rest only write the latitude and
+longitude. If LOCATION_FLUSH_INTERVAL is set then positions are buffered in memory and flushed
+in one bulk update every few seconds instead of being written per request. The flush thread is
+started by the first buffered location, so only processes that serve requests run one.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+import atexit
+import logging
+import threading
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from locations.chunk_handling import haversine
+
+from .models import Profile
+
+# profile pk -> (latitude, longitude) waiting to be flushed
+_pending_locations: dict[int, tuple[float, float]] = {}
+_pending_lock = threading.Lock()
+_stop_flushing = threading.Event()
+_flush_thread: Optional[threading.Thread] = None  # pylint: disable=invalid-name
+
+logger = logging.getLogger(__name__)
+
+
+def buffering_enabled() -> bool:
+    """
+    Whether locations are buffered and flushed in bulk rather than written straight away.
+
+    @return: True if locations are buffered
+    """
+    return settings.LOCATION_FLUSH_INTERVAL > 0
+
+
+def get_profile_location(profile: Profile) -> tuple[float, float]:
+    """
+    Get the latest known location of a profile, including any that hasn't been flushed yet.
+
+    @param profile: The profile to get the location of
+    @return: A tuple of (latitude, longitude)
+    """
+    with _pending_lock:
+        pending = _pending_locations.get(profile.pk)
+    return pending if pending is not None else (profile.latitude, profile.longitude)
+
+
+def record_location(profile: Profile, lat: float, lon: float) -> bool:
+    """
+    Record a new location for a profile, skipping it if the user hasn't moved far enough.
+
+    @param profile: The profile to update
+    @param lat: The new latitude
+    @param lon: The new longitude
+    @return: True if the location was stored (or buffered), False if it was skipped
+    """
+    last_lat, last_lon = get_profile_location(profile)
+    if haversine(last_lat, last_lon, lat, lon) < settings.LOCATION_UPDATE_MIN_DISTANCE:
+        return False
+
+    profile.latitude = lat
+    profile.longitude = lon
+    if buffering_enabled():
+        with _pending_lock:
+            _pending_locations[profile.pk] = (lat, lon)
+        start_flush_thread()
+    else:
+        profile.save(update_fields=["latitude", "longitude"])
+    return True
+
+
+def flush_locations() -> int:
+    """
+    Write every buffered location to the database in bulk. If the write fails the locations
+    are put back in the buffer (unless a newer one has arrived) for the next flush.
+
+    @return: The number of profiles updated
+    """
+    global _pending_locations  # pylint: disable=global-statement
+
+    with _pending_lock:
+        pending, _pending_locations = _pending_locations, {}
+    if not pending:
+        return 0
+
+    profiles = [Profile(pk=pk, latitude=lat, longitude=lon)
+                for pk, (lat, lon) in pending.items()]
+    try:
+        return Profile.objects.bulk_update(profiles, ["latitude", "longitude"], batch_size=500)
+    except Exception:
+        with _pending_lock:
+            _pending_locations = {**pending, **_pending_locations}
+        raise
+
+
+def _flush_forever() -> None:
+    """
+    Flush the buffered locations every LOCATION_FLUSH_INTERVAL seconds until stopped.
+    A failed flush is logged and retried next time rather than ending the thread.
+
+    @return: None
+    """
+    while not _stop_flushing.wait(settings.LOCATION_FLUSH_INTERVAL):
+        try:
+            flush_locations()
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Failed to flush buffered locations, retrying next interval")
+        finally:
+            close_old_connections()
+
+
+def start_flush_thread() -> threading.Thread:
+    """
+    Start the background thread in this process that flushes the buffered locations, if it
+    isn't already running, and flush once more when the process exits.
+
+    @return: The flush thread
+    """
+    global _flush_thread  # pylint: disable=global-statement
+
+    with _pending_lock:
+        if _flush_thread is None:
+            _flush_thread = threading.Thread(
+                target=_flush_forever, name="flush-locations", daemon=True)
+            _flush_thread.start()
+            atexit.register(flush_locations)  # don't lose the last few locations on shutdown
+        return _flush_thread
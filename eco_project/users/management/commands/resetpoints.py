@@ -1,28 +1,23 @@
 """
-This command updates all user profile points based on their pets.
+This command rebuilds all user profile points from the points ledger.
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
-from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
 
-User = get_user_model()
+from users.points import rebuild_points_from_ledger
 
 
 class Command(BaseCommand):
     """
-    This class is a Django management command that updates all user profile points
-    based on their pets
+    This class is a Django management command that rebuilds all user profile points
+    from the points ledger
     """
-    help = "Updates all user profile points based on their pets"
+    help = "Rebuilds all user profile points from the points ledger"
 
     def handle(self, *args, **kwargs):
         """
-        This method updates all user profile points based on their pets
+        This method rebuilds all user profile points from the points ledger in one update
         """
-        users = User.objects.all()
-        updated = 0
-        for user in users:
-            user.profile.update_points()
-            updated += 1
+        updated = rebuild_points_from_ledger()
         self.stdout.write(f"Updated points for {updated} profiles")
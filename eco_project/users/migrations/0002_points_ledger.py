@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_opening_balances(apps, schema_editor):
+    """
+    Record everyone's existing points as an opening balance so the ledger adds up to them.
+    """
+    profile_model = apps.get_model("users", "Profile")
+    ledger_model = apps.get_model("users", "PointsLedgerEntry")
+    ledger_model.objects.bulk_create(
+        [ledger_model(user_id=user_id, amount=points, reason="opening")
+         for user_id, points in profile_model.objects.filter(points__gt=0)
+         .values_list("user_id", "points")],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('streak', 'Streak collected'), ('feature', 'Feature reached'), ('question', 'Question answered'), ('quiz', 'Quiz completed'), ('adjustment', 'Manual adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Points ledger entries',
+            },
+        ),
+        migrations.RunPython(add_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0002_pet_health_decayed_at'),
+        ('users', '0002_points_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-points', 'user'], name='profile_points_rank_idx'),
+        ),
+    ]
@@ -52,6 +52,49 @@ class Profile(models.Model):
         """
         return f"{self.user.username}'s Profile"
 
+    class Meta:
+        """
+        Index the points so the leaderboard can be read in order without sorting every profile.
+        """
+
+        indexes = [models.Index(fields=["-points", "user"], name="profile_points_rank_idx")]
+
+
+class PointsLedgerEntry(models.Model):
+    """
+    This model is an append-only record of every change to a user's points.
+    A profile's points are always the sum of its user's ledger entries.
+    """
+
+    REASON_CHOICES = [
+        ("opening", "Opening balance"),
+        ("streak", "Streak collected"),
+        ("feature", "Feature reached"),
+        ("question", "Question answered"),
+        ("quiz", "Quiz completed"),
+        ("adjustment", "Manual adjustment"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="points_ledger")
+    amount = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the ledger entry.
+
+        @return: a string representation of the ledger entry
+        """
+        return f"{self.user.username} {self.amount:+d} ({self.reason})"
+
+    class Meta:
+        """
+        Show the ledger in a readable way in the admin panel.
+        """
+
+        verbose_name_plural = "Points ledger entries"
+
 
 class Badge(models.Model):
     """
@@ -0,0 +1,69 @@
+"""
+This module is the only place that should change a user's points. Every award is applied as
+a single atomic UPDATE and recorded in the points ledger, so concurrent awards can't overwrite
+each other and the points can always be rebuilt from the ledger.
+
+@author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from leaderboard.ranking import rebuild_leaderboard, record_points_change
+
+from .models import PointsLedgerEntry, Profile
+
+User = get_user_model()
+
+
+def award_points(user: User, amount: int, reason: str) -> int:
+    """
+    Add points to a user's profile and record it in the ledger.
+    Taking away more points than the user has only takes them down to 0.
+
+    @param user: The user to award the points to
+    @param amount: How many points to award, negative to take points away
+    @param reason: Why the points were awarded, one of PointsLedgerEntry.REASON_CHOICES
+    @return: How many points were actually awarded
+    """
+    if not amount:
+        return 0
+
+    with transaction.atomic():
+        if amount < 0:
+            # lock the row so the balance the amount is limited by can't change before the update
+            points = Profile.objects.select_for_update().filter(
+                user=user).values_list("points", flat=True).first()
+            if points is not None:
+                amount = max(amount, -points)
+            if not amount:
+                return 0
+
+        PointsLedgerEntry.objects.create(user=user, amount=amount, reason=reason)
+        if Profile.objects.filter(user=user).update(points=F("points") + amount):
+            # the row is locked by the update so this reads back our own change
+            new_points = Profile.objects.filter(user=user).values_list("points", flat=True)[0]
+            record_points_change(new_points - amount, new_points)
+
+    # keep an already loaded profile roughly in step for the rest of the request
+    if "profile" in user._state.fields_cache:  # pylint: disable=protected-access
+        user.profile.points += amount
+    return amount
+
+
+def rebuild_points_from_ledger() -> int:
+    """
+    Set every profile's points to the sum of its user's ledger entries in one UPDATE,
+    then rebuild the leaderboard to match.
+
+    @return: The number of profiles updated
+    """
+    ledger_totals = PointsLedgerEntry.objects.filter(
+        user=OuterRef("user")
+    ).order_by().values("user").annotate(total=Sum("amount")).values("total")
+
+    with transaction.atomic():
+        updated = Profile.objects.update(points=Coalesce(Subquery(ledger_totals), Value(0)))
+        rebuild_leaderboard()
+    return updated
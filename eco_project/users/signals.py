@@ -17,8 +17,8 @@ User = get_user_model()
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs) -> None:
     """
-    Creates a Profile if one doesn't exist,
-    and then saves it.
+    Creates a Profile if one doesn't exist.
+    An existing profile isn't re-saved as that would overwrite any concurrent points awards.
 
     @param sender: The sender of the signal
     @param instance: The instance of the sender
@@ -26,5 +26,4 @@ def create_or_update_user_profile(sender, instance, created, **kwargs) -> None:
     @param kwargs: Additional keyword arguments
     @return: None
     """
-    profile, _ = Profile.objects.get_or_create(user=instance)
-    profile.save()
+    Profile.objects.get_or_create(user=instance)
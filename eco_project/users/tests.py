@@ -3,10 +3,27 @@ This module contains tests for the users app.
 
 @author: 730003140, 730009864, 730020278, 730022096, 730002704, 730019821, 720039505
 """
-from django.contrib.auth import get_user_model
-from django.test import TestCase
+import json
+from unittest.mock import patch
 
-from .models import Profile, Badge, BadgeInstance, UserGroup, generate_unique_code
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+
+from challenges.challenge_helpers import claim_feature_reach
+from locations.feature_snapshot import invalidate_feature_snapshot
+from locations.models import FeatureInstance, FeatureType
+
+from .models import Profile, Badge, BadgeInstance, UserGroup, PointsLedgerEntry, \
+    generate_unique_code
+from .location_stream import CLOSE_FORBIDDEN, location_stream
+from .location_updates import flush_locations, get_profile_location
+from .points import award_points, rebuild_points_from_ledger
 
 User = get_user_model()
 
@@ -44,6 +61,302 @@ class ProfileModelTests(TestCase):
         self.assertEqual(str(self.profile), "testuser's Profile")
 
 
+class PointsTests(TestCase):
+    """
+    Test the points service and ledger.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create a user for testing.
+
+        @return: None
+        """
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+
+    def test_award_points(self) -> None:
+        """
+        Awarding points should update only the points column and add a ledger entry,
+        without losing points awarded through a stale copy of the profile.
+
+        @return: None
+        """
+        stale_user = User.objects.get(pk=self.user.pk)
+        stale_user.profile  # pylint: disable=pointless-statement
+
+        with CaptureQueriesContext(connection) as queries:
+            award_points(self.user, 5, "streak")
+        profile_updates = [query["sql"] for query in queries.captured_queries
+                           if query["sql"].startswith('UPDATE "users_profile"')]
+        self.assertEqual(len(profile_updates), 1)
+        self.assertIn('SET "points" = ("users_profile"."points" + 5) WHERE', profile_updates[0])
+        award_points(stale_user, 3, "quiz")
+
+        self.assertEqual(Profile.objects.get(user=self.user).points, 8)
+        self.assertEqual(stale_user.profile.points, 3)  # the loaded profile is kept in step
+        self.assertEqual(
+            list(PointsLedgerEntry.objects.order_by("pk").values_list("amount", "reason")),
+            [(5, "streak"), (3, "quiz")])
+
+    def test_deduction_limited_to_balance(self) -> None:
+        """
+        Taking away more points than a user has should leave them on 0, with the ledger
+        recording what was actually taken, including through the admin.
+
+        @return: None
+        """
+        award_points(self.user, 5, "streak")
+        self.assertEqual(award_points(self.user, -3, "adjustment"), -3)
+        self.assertEqual(award_points(self.user, -10, "adjustment"), -2)
+        self.assertEqual(award_points(self.user, -1, "adjustment"), 0)
+        self.assertEqual(Profile.objects.get(user=self.user).points, 0)
+
+        admin_user = User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.force_login(admin_user)
+        award_points(self.user, 4, "streak")
+        response = self.client.post(reverse("admin:users_pointsledgerentry_add"), {
+            "user": self.user.pk, "amount": -50, "reason": "adjustment"}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "so 4 were taken away instead of 50")
+
+        self.assertEqual(Profile.objects.get(user=self.user).points, 0)
+        self.assertEqual(
+            list(PointsLedgerEntry.objects.order_by("pk").values_list("amount", flat=True)),
+            [5, -3, -2, 4, -4])
+
+    def test_edit_profile_only_saves_bio(self) -> None:
+        """
+        Editing the profile should only write the bio, so points awarded while the form
+        was being saved aren't overwritten.
+
+        @return: None
+        """
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("users:edit"), {
+                "first_name": "Test", "last_name": "User", "bio": "Hello"})
+        self.assertEqual(response.status_code, 302)
+        profile_updates = [query["sql"] for query in queries.captured_queries
+                           if query["sql"].startswith('UPDATE "users_profile"')]
+        self.assertEqual(len(profile_updates), 1)
+        self.assertNotIn('"points"', profile_updates[0])
+        self.assertEqual(Profile.objects.get(user=self.user).bio, "Hello")
+
+    def test_rebuild_points_from_ledger(self) -> None:
+        """
+        Rebuilding should set every profile's points to the sum of its ledger entries.
+
+        @return: None
+        """
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        award_points(self.user, 5, "streak")
+        award_points(self.user, 2, "feature")
+        Profile.objects.update(points=100)  # points that have drifted from the ledger
+
+        self.assertEqual(rebuild_points_from_ledger(), 2)
+        self.assertEqual(Profile.objects.get(user=self.user).points, 7)
+        self.assertEqual(Profile.objects.get(user=other_user).points, 0)
+
+
+class LocationUpdateTests(TestCase):
+    """
+    Test the location ingestion path.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create and log in a user for testing.
+
+        @return: None
+        """
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        flush_locations()  # start without anything buffered
+
+    def post_location(self, lat: float, lon: float) -> dict:
+        """
+        Send a location to the API.
+
+        @param lat: The latitude to send
+        @param lon: The longitude to send
+        @return: The JSON response
+        """
+        return self.client.post(
+            reverse("users:update_location"), {"lat": lat, "lon": lon}).json()
+
+    def test_small_moves_are_skipped(self) -> None:
+        """
+        Only moves past the threshold should be written, and only the location columns.
+
+        @return: None
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.post_location(50.7358, -3.5345)["stored"])
+        updates = [query["sql"] for query in queries.captured_queries
+                   if query["sql"].startswith('UPDATE "users_profile"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"points"', updates[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(self.post_location(50.73581, -3.53451)["stored"])  # ~1m
+        self.assertFalse(any(query["sql"].startswith("UPDATE")
+                             for query in queries.captured_queries))
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.latitude, profile.longitude), (50.7358, -3.5345))
+
+    @override_settings(LOCATION_FLUSH_INTERVAL=5)
+    @patch("users.location_updates.start_flush_thread")
+    def test_buffered_locations_are_flushed(self, start_flush_thread) -> None:
+        """
+        With buffering on, locations should be visible straight away but only written when
+        the buffer is flushed.
+
+        @param start_flush_thread: The mocked flush thread starter
+        @return: None
+        """
+        self.post_location(50.7358, -3.5345)
+        start_flush_thread.assert_called_once()
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.latitude, profile.longitude), (0, 0))
+        self.assertEqual(get_profile_location(profile), (50.7358, -3.5345))
+
+        self.assertEqual(flush_locations(), 1)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.latitude, profile.longitude), (50.7358, -3.5345))
+        self.assertEqual(flush_locations(), 0)
+
+    @override_settings(LOCATION_FLUSH_INTERVAL=5)
+    @patch("users.location_updates.start_flush_thread")
+    def test_failed_flush_keeps_locations(self, _start_flush_thread) -> None:
+        """
+        If writing the buffer fails the locations should be kept for the next flush.
+
+        @param _start_flush_thread: The mocked flush thread starter
+        @return: None
+        """
+        self.post_location(50.7358, -3.5345)
+        with patch.object(Profile.objects, "bulk_update", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                flush_locations()
+        self.assertEqual(flush_locations(), 1)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.latitude, profile.longitude), (50.7358, -3.5345))
+
+
+class LocationStreamTests(TransactionTestCase):
+    """
+    Test the location WebSocket.
+    A TransactionTestCase is used as the stream manages its own database connections.
+    """
+
+    def setUp(self) -> None:
+        """
+        Create and log in a user for testing.
+
+        @return: None
+        """
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        """
+        Forget the feature snapshot as the database is emptied after each test.
+
+        @return: None
+        """
+        invalidate_feature_snapshot()
+
+    def connect(self, cookie: str) -> ApplicationCommunicator:
+        """
+        Start a WebSocket connection to the location stream.
+
+        @param cookie: The cookie header to connect with
+        @return: The communicator for the connection
+        """
+        return ApplicationCommunicator(location_stream, {
+            "type": "websocket",
+            "path": "/ws/location/",
+            "headers": [(b"cookie", cookie.encode()), (b"origin", b"http://127.0.0.1:8000")],
+        })
+
+    def test_stream_requires_login(self) -> None:
+        """
+        Connections without a signed in session should be refused.
+
+        @return: None
+        """
+        async def run():
+            communicator = self.connect("")
+            await communicator.send_input({"type": "websocket.connect"})
+            return await communicator.receive_output(timeout=5)
+
+        self.assertEqual(async_to_sync(run)(), {"type": "websocket.close",
+                                                "code": CLOSE_FORBIDDEN})
+
+    def test_stream_updates_location(self) -> None:
+        """
+        Locations sent over the stream should be stored, with the challenges sent back.
+
+        @return: None
+        """
+        cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+
+        async def run():
+            communicator = self.connect(cookie)
+            await communicator.send_input({"type": "websocket.connect"})
+            accepted = await communicator.receive_output(timeout=5)
+            await communicator.send_input({"type": "websocket.receive", "text": "nonsense"})
+            error = await communicator.receive_output(timeout=5)
+            await communicator.send_input({"type": "websocket.receive",
+                                           "text": json.dumps({"lat": 50.7, "lon": -3.5})})
+            challenges = await communicator.receive_output(timeout=5)
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=5)
+            return accepted, error, challenges
+
+        accepted, error, challenges = async_to_sync(run)()
+        self.assertEqual(accepted, {"type": "websocket.accept"})
+        self.assertEqual(json.loads(error["text"])["type"], "error")
+        self.assertEqual(json.loads(challenges["text"]), {"type": "challenges", "challenges": []})
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.latitude, profile.longitude), (50.7, -3.5))
+
+    @override_settings(LOCATION_CHALLENGE_REFRESH_INTERVAL=0.2)
+    def test_stream_refreshes_challenges(self) -> None:
+        """
+        Reaching a feature should remove its challenge from the stream without the user moving.
+
+        @return: None
+        """
+        feature_type = FeatureType.objects.create(
+            name="Test Feature Type", colour="#ffffff", description="A dummy feature type",
+            generic_img=SimpleUploadedFile("generic.jpg", b"generic content",
+                                           content_type="image/jpeg"))
+        feature = FeatureInstance.objects.create(
+            slug="pond", name="Pond", latitude=50.7, longitude=-3.5, feature=feature_type)
+        cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+
+        async def run():
+            communicator = self.connect(cookie)
+            await communicator.send_input({"type": "websocket.connect"})
+            await communicator.receive_output(timeout=5)
+            await communicator.send_input({"type": "websocket.receive",
+                                           "text": json.dumps({"lat": 50.7, "lon": -3.5})})
+            before = await communicator.receive_output(timeout=5)
+            await sync_to_async(claim_feature_reach)(self.user, feature)
+            after = await communicator.receive_output(timeout=5)
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=5)
+            return before, after
+
+        before, after = async_to_sync(run)()
+        self.assertEqual([challenge["description"] for challenge
+                          in json.loads(before["text"])["challenges"]], ["Pond"])
+        self.assertEqual(json.loads(after["text"]), {"type": "challenges", "challenges": []})
+
+
 class BadgeModelTests(TestCase):
     """
     Test the Badge model.
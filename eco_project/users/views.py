@@ -114,9 +114,9 @@ def profile_view(request, username) -> HttpResponse:
     # Get the user's challenges completed in the current window
     now_time = timezone.now()
     interval = ChallengeSettings.get_solo().interval
-    window_start, window_end = get_current_window(now_time, interval)
+    window_start, _ = get_current_window(now_time, interval)
     user_feature_reaches = UserFeatureReach.objects.filter(
-        user=user, reached_at__gte=window_start, reached_at__lt=window_end, extra="")
+        user=user, window_start=window_start, extra="")
     # only take most recent 10
     user_feature_reaches = user_feature_reaches.order_by("-reached_at")[:10]
 
@@ -155,7 +155,10 @@ def edit_profile(request) -> HttpResponse:
         profile_form = ModifyProfileForm(request.POST, instance=profile)
         if user_form.is_valid() and profile_form.is_valid():
             user_form.save()
-            profile_form.save()
+            # only write the bio so points and locations changed since the profile was loaded
+            # aren't overwritten
+            profile = profile_form.save(commit=False)
+            profile.save(update_fields=["bio"])
 
             return redirect("users:user_profile", username=user.username)
     else:  # if we are just displaying the form for the first time